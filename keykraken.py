@@ -5,169 +5,347 @@ A Qt-based application for creating and executing automation macros
 
 import sys
 import os
-import json
-import time
+import threading
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless commands exit here, before Qt is imported
+    import utils.cli
+    if sys.argv[1] in utils.cli.COMMANDS:
+        # Spawned worker processes re-import __main__; point it at the CLI
+        # module so they never re-run this script and import Qt
+        sys.modules['__main__'] = utils.cli
+        sys.exit(utils.cli.main())
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QListWidget, QLabel, QTextEdit, QDialog,
+    QPushButton, QListWidget, QListWidgetItem, QLabel, QTextEdit, QDialog,
     QLineEdit, QSpinBox, QDoubleSpinBox, QComboBox, QMessageBox,
-    QSplitter, QGroupBox, QTableWidget, QTableWidgetItem, QHeaderView,
-    QFileDialog, QProgressDialog, QInputDialog
+    QSplitter, QGroupBox, QTableView, QAbstractItemView, QHeaderView,
+    QFileDialog, QProgressDialog, QInputDialog, QCheckBox
+)
+from PySide6.QtCore import (
+    Qt, QThread, Signal, QTimer, QAbstractTableModel, QModelIndex, QFileSystemWatcher, QPoint
 )
-from PySide6.QtCore import Qt, QThread, Signal, QTimer
 from PySide6.QtGui import QIcon, QPixmap, QFont, QColor
 
-import pyautogui
-import pynput
-from pynput import mouse, keyboard
+from utils.input_backend import InputBackend, create_backend
+from utils.scenario_store import (
+    save_scenario_file, scenario_paths,
+    BINARY_EXTENSION, JSON_EXTENSION
+)
+from utils.scenario_index import ScenarioIndex
+from utils.scenario_cache import ScenarioCache, ScenarioPrefetcher
+from utils.engine import MacroEngine
+from utils.delay_tuning import DelayTuner, tuning_path
+from utils.scenario_runner import BatchRunner, DEFAULT_GAP
+from utils.recording import coalesce_keypresses, PathBuilder, DEFAULT_MOVE_TOLERANCE
+from utils.step_plan import (
+    DEFAULT_COLOR_TOLERANCE, DEFAULT_CONFIDENCE, DEFAULT_IMAGE_TIMEOUT, DEFAULT_POLL_INTERVAL,
+    DEFAULT_STABLE_SECONDS, DEFAULT_TYPE_INTERVAL, DEFAULT_WAIT_TIMEOUT
+)
+
+# How often the main window samples executor progress while a scenario runs
+PROGRESS_FPS = 30
+# Quiet period after the last change in the scenarios folder before the list is updated
+SCENARIO_WATCH_DEBOUNCE_MS = 300
+# Scenarios either side of the selected one, and most recently modified ones,
+# parsed in the background so opening them next is instant
+PREFETCH_NEIGHBOURS = 2
+PREFETCH_RECENT = 3
+# Time to position windows before a run starts
+COUNTDOWN_SECONDS = 3
+# Largest delay the step editor accepts; recorded delays are real gaps between
+# actions and can be long, so the editor must not clamp them
+MAX_DELAY_SECONDS = 3600
 
 
 class MacroRecorder(QThread):
-    """Thread for recording mouse and keyboard actions"""
-    step_recorded = Signal(dict)
+    """
+    Thread for recording mouse and keyboard actions.
+    Listener callbacks only timestamp the event and append it to a buffer; the
+    thread itself just sleeps on the stop event and tears the listener down.
+    Recorded steps reach the GUI in batches through steps_recorded, every
+    FLUSH_INTERVAL or once BATCH_SIZE steps have piled up.
+    Each step's delay is the real gap to the next event, so the newest step is
+    held back until the next event (or stop) tells us how long it lasted.
+    With capture_moves, pointer samples between other events are compressed
+    into a single path step by a PathBuilder.
+    """
+    steps_recorded = Signal(list)
     recording_stopped = Signal()
+    batch_ready = Signal()
     
-    def __init__(self):
+    FLUSH_INTERVAL = 0.1
+    BATCH_SIZE = 64
+    
+    def __init__(self, backend: Optional[InputBackend] = None, capture_moves: bool = False,
+                 move_tolerance: float = DEFAULT_MOVE_TOLERANCE):
         super().__init__()
+        self.backend = backend
+        self.capture_moves = capture_moves
+        self.path_builder = PathBuilder(move_tolerance)
         self.recording = False
         self.steps = []
-        self.mouse_listener = None
-        self.keyboard_listener = None
-        
-    def run(self):
+        self.listener = None
+        # deque append/popleft are atomic, so listener threads never take a lock.
+        # Entries are (t_ns, step) for steps and (t_ns, x, y) for pointer samples.
+        self._buffer = deque()
+        self._held = None
+        self._batch_pending = False
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(int(self.FLUSH_INTERVAL * 1000))
+        self._flush_timer.timeout.connect(self.flush)
+        self.batch_ready.connect(self.flush)
+    
+    def _buffer_event(self, entry: Tuple):
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.BATCH_SIZE and not self._batch_pending:
+            self._batch_pending = True
+            self.batch_ready.emit()
+    
+    def _push(self, start_ns: int, end_ns: int, step: Dict[str, Any], batch: List[Dict[str, Any]]):
+        """Release the held step now that we know when the next one starts, then hold this one"""
+        if self._held is not None:
+            held_end, held_step = self._held
+            held_step["delay"] = round((start_ns - held_end) / 1e9, 3)
+            batch.append(held_step)
+        self._held = (end_ns, step)
+    
+    def _close_path(self, batch: List[Dict[str, Any]]):
+        path = self.path_builder.close()
+        if path is not None:
+            self._push(*path, batch)
+    
+    def flush(self, final: bool = False):
+        with self._flush_lock:
+            self._batch_pending = False
+            buffer = self._buffer
+            batch = []
+            while buffer:
+                entry = buffer.popleft()
+                if len(entry) == 3:
+                    self.path_builder.add(*entry)
+                    continue
+                t_ns, step = entry
+                self._close_path(batch)
+                self._push(t_ns, t_ns, step, batch)
+            if final:
+                self._close_path(batch)
+                # The last step has nothing after it, so it keeps its default delay
+                if self._held is not None:
+                    batch.append(self._held[1])
+                    self._held = None
+            if batch:
+                self.steps.extend(batch)
+                self.steps_recorded.emit(batch)
+    
+    def _on_click(self, x: int, y: int, button: str, t_ns: int):
+        if self._stop_event.is_set():
+            return
+        self._buffer_event((t_ns, {
+            "name": f"Click at ({x}, {y})",
+            "type": "click",
+            "value": [x, y],
+            "delay": 0.25,
+            "button": button
+        }))
+    
+    def _on_press(self, key_name: str, t_ns: int):
+        if self._stop_event.is_set():
+            return
+        self._buffer_event((t_ns, {
+            "name": f"Press key: {key_name}",
+            "type": "keypress",
+            "value": key_name,
+            "delay": 0.1
+        }))
+    
+    def _on_move(self, x: int, y: int, t_ns: int):
+        if self._stop_event.is_set():
+            return
+        self._buffer_event((t_ns, x, y))
+    
+    def start_recording(self):
         self.recording = True
         self.steps = []
+        self._held = None
+        self.path_builder = PathBuilder(self.path_builder.tolerance)
+        self._stop_event.clear()
+        self._flush_timer.start()
+        self.start()
         
-        def on_click(x, y, button, pressed):
-            if not self.recording:
-                return False
-            if pressed:
-                step = {
-                    "name": f"Click at ({x}, {y})",
-                    "type": "click",
-                    "value": [x, y],
-                    "delay": 0.25,
-                    "button": "left" if button == mouse.Button.left else "right"
-                }
-                self.steps.append(step)
-                self.step_recorded.emit(step)
-        
-        def on_press(key):
-            if not self.recording:
-                return False
-            try:
-                key_name = key.char
-            except AttributeError:
-                key_name = str(key).replace('Key.', '')
-            
-            step = {
-                "name": f"Press key: {key_name}",
-                "type": "keypress",
-                "value": key_name,
-                "delay": 0.1
-            }
-            self.steps.append(step)
-            self.step_recorded.emit(step)
-        
-        self.mouse_listener = mouse.Listener(on_click=on_click)
-        self.keyboard_listener = keyboard.Listener(on_press=on_press)
-        
-        self.mouse_listener.start()
-        self.keyboard_listener.start()
-        
-        while self.recording:
-            time.sleep(0.1)
-        
-        self.mouse_listener.stop()
-        self.keyboard_listener.stop()
+    def run(self):
+        if self.backend is None:
+            self.backend = create_backend()
+        self.listener = self.backend.listen(self._on_click, self._on_press,
+                                            self._on_move if self.capture_moves else None)
+        
+        self._stop_event.wait()
+        
+        self.listener.stop()
+        self.listener.join()
+        self.flush(final=True)
         self.recording_stopped.emit()
     
     def stop_recording(self):
         self.recording = False
+        self._flush_timer.stop()
+        self._stop_event.set()
 
 
 class MacroExecutor(QThread):
-    """Thread for executing macro steps"""
-    step_executed = Signal(int, str)
+    """
+    Thread for executing macro steps with a MacroEngine.
+    Per-step progress is published to self.progress as (iteration, step index)
+    rather than signalled, so the GUI can sample it at its own frame rate.
+    """
     execution_finished = Signal(bool, str)
     iteration_started = Signal(int, int)
     
-    def __init__(self, steps: List[Dict[str, Any]], iterations: int = 1):
+    MIN_SPEED = MacroEngine.MIN_SPEED
+    MAX_SPEED = MacroEngine.MAX_SPEED
+    
+    def __init__(self, steps: Sequence[Dict[str, Any]], iterations: int = 1, timing: str = 'relative',
+                 backend: Optional[InputBackend] = None, speed: float = 1.0,
+                 base_dir: Optional[Path] = None, tuner: Optional[DelayTuner] = None,
+                 start_delay: float = 0.0):
         super().__init__()
+        self.engine = MacroEngine(steps, iterations, timing, backend, speed,
+                                  on_iteration=self.iteration_started.emit, base_dir=base_dir, tuner=tuner,
+                                  start_delay=start_delay)
+        self.tuner = tuner
         self.steps = steps
         self.iterations = iterations
-        self.should_stop = False
-        
+    
+    @property
+    def progress(self) -> Optional[Tuple[int, int]]:
+        return self.engine.progress
+    
+    @property
+    def timing_report(self) -> Optional[Dict[str, float]]:
+        return self.engine.timing_report
+    
+    @property
+    def wait_report(self) -> Optional[Dict[str, Any]]:
+        return self.engine.wait_report
+    
+    @property
+    def should_stop(self) -> bool:
+        return self.engine.should_stop
+    
+    def run(self):
+        success, message = self.engine.run()
+        self.execution_finished.emit(success, message)
+    
+    def stop(self):
+        self.engine.stop()
+
+
+class BatchExecutor(QThread):
+    """
+    Thread for running several scenarios back-to-back with a BatchRunner.
+    Progress is sampled from self.progress like MacroExecutor's; runner events
+    are forwarded through batch_event.
+    """
+    batch_event = Signal(str, dict)
+    batch_finished = Signal(bool, str)
+    
+    def __init__(self, paths: Sequence[Path], **options):
+        super().__init__()
+        self.runner = BatchRunner(paths, on_event=self.batch_event.emit, **options)
+    
+    @property
+    def progress(self) -> Optional[Tuple[int, int, int, int]]:
+        return self.runner.progress
+    
+    @property
+    def current_steps(self) -> Sequence[Dict[str, Any]]:
+        return self.runner.current_steps
+    
     def run(self):
         try:
-            pyautogui.FAILSAFE = True
-            
-            for iteration in range(self.iterations):
-                if self.should_stop:
-                    self.execution_finished.emit(False, "Execution stopped by user")
+            success = self.runner.run()
+        except Exception as e:
+            self.batch_finished.emit(False, f"Error: {str(e)}")
+            return
+        self.batch_finished.emit(success, self.runner.summary())
+    
+    def stop(self):
+        self.runner.stop()
+
+
+class ScenarioSaver(QThread):
+    """
+    Thread that writes scenarios to disk off the GUI thread.
+    Saves are queued per target file; saving the same file again before its
+    write starts replaces the queued snapshot, so only the latest one is written.
+    save_finished(name, path, error) reports each completed write; error is
+    empty on success.
+    """
+    save_finished = Signal(str, str, str)
+    
+    def __init__(self):
+        super().__init__()
+        self._pending: Dict[Path, Tuple[str, Dict[str, Any], List[Path]]] = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+    
+    def save(self, name: str, path: Path, data: Dict[str, Any], remove: Sequence[Path] = ()):
+        """
+        Queue a snapshot for writing.
+        :param data: Scenario dict; must not be mutated afterwards.
+        :param remove: Files to delete once the write succeeded.
+        """
+        with self._condition:
+            self._pending.pop(path, None)
+            self._pending[path] = (name, data, list(remove))
+            self._condition.notify()
+    
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
                     return
-                
-                self.iteration_started.emit(iteration + 1, self.iterations)
-                
-                for idx, step in enumerate(self.steps):
-                    if self.should_stop:
-                        self.execution_finished.emit(False, "Execution stopped by user")
-                        return
-                    
-                    self.step_executed.emit(idx, f"[{iteration + 1}/{self.iterations}] Executing: {step['name']}")
-                    
-                    step_type = step.get('type', '')
-                    value = step.get('value', '')
-                    delay = step.get('delay', 0.25)
-                    
-                    if step_type == 'click':
-                        if isinstance(value, list) and len(value) == 2:
-                            x, y = value
-                        else:
-                            x, y = 0, 0
-                        button = step.get('button', 'left')
-                        pyautogui.click(x, y, button=button)
-                    
-                    elif step_type == 'keypress':
-                        pyautogui.press(value)
-                    
-                    elif step_type == 'type':
-                        pyautogui.typewrite(value, interval=0.05)
-                    
-                    elif step_type == 'scroll':
-                        pyautogui.scroll(int(value))
-                    
-                    elif step_type == 'delay':
-                        time.sleep(float(value))
-                    
-                    elif step_type == 'move':
-                        if isinstance(value, list) and len(value) == 2:
-                            x, y = value
-                        else:
-                            x, y = 0, 0
-                        pyautogui.moveTo(x, y)
-                    
-                    time.sleep(delay)
-            
-            self.execution_finished.emit(True, f"Execution completed successfully ({self.iterations} iteration(s))")
+                path = next(iter(self._pending))
+                name, data, remove = self._pending.pop(path)
         
-        except Exception as e:
-            self.execution_finished.emit(False, f"Error: {str(e)}")
+            try:
+                save_scenario_file(path, data)
+                for other_path in remove:
+                    if other_path.exists():
+                        other_path.unlink()
+                error = ""
+            except Exception as e:
+                error = str(e)
+        
+            with self._condition:
+                superseded = path in self._pending
+            if not superseded:
+                self.save_finished.emit(name, str(path), error)
     
     def stop(self):
-        self.should_stop = True
+        """Finish queued writes, then end the thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
 
 
 class StepEditorDialog(QDialog):
     """Dialog for adding/editing individual macro steps"""
     
-    def __init__(self, parent=None, step_data: Optional[Dict] = None):
+    def __init__(self, parent=None, step_data: Optional[Dict] = None, image_dir: Optional[Path] = None):
         super().__init__(parent)
         self.step_data = step_data or {}
+        self.image_dir = image_dir  # Image paths inside it are stored relative to it
         self.setWindowTitle("Edit Step" if step_data else "Add Step")
         self.setModal(True)
         self.setMinimumWidth(500)
@@ -187,7 +365,8 @@ class StepEditorDialog(QDialog):
         type_layout = QHBoxLayout()
         type_layout.addWidget(QLabel("Type:"))
         self.type_combo = QComboBox()
-        self.type_combo.addItems(['click', 'keypress', 'type', 'scroll', 'move', 'delay'])
+        self.type_combo.addItems(['click', 'keypress', 'type', 'scroll', 'move', 'path', 'image',
+                                  'wait_pixel', 'wait_image', 'wait_region_stable', 'delay'])
         current_type = self.step_data.get('type', 'click')
         self.type_combo.setCurrentText(current_type)
         self.type_combo.currentTextChanged.connect(self.on_type_changed)
@@ -204,12 +383,51 @@ class StepEditorDialog(QDialog):
         delay_layout = QHBoxLayout()
         delay_layout.addWidget(QLabel("Delay (seconds):"))
         self.delay_input = QDoubleSpinBox()
-        self.delay_input.setRange(0, 10)
+        self.delay_input.setRange(0, MAX_DELAY_SECONDS)
+        # Recorded delays have millisecond precision
+        self.delay_input.setDecimals(3)
         self.delay_input.setSingleStep(0.1)
         self.delay_input.setValue(self.step_data.get('delay', 0.25))
         delay_layout.addWidget(self.delay_input)
         layout.addLayout(delay_layout)
         
+        # Verify condition, used by adaptive delays
+        verify_layout = QHBoxLayout()
+        verify = self.step_data.get('verify')
+        self.verify_checkbox = QCheckBox("Verify pixel")
+        self.verify_checkbox.setToolTip(
+            "With adaptive delays, the delay after this step shrinks to how soon this pixel has this color"
+        )
+        self.verify_x_input = QSpinBox()
+        self.verify_x_input.setRange(0, 10000)
+        self.verify_y_input = QSpinBox()
+        self.verify_y_input.setRange(0, 10000)
+        self.verify_color_input = QLineEdit('#000000')
+        self.verify_color_input.setPlaceholderText("#rrggbb")
+        self.verify_color_input.setMaximumWidth(80)
+        verify_sample_btn = QPushButton("Sample")
+        verify_sample_btn.clicked.connect(lambda: self.verify_color_input.setText(
+            self.screen_color(self.verify_x_input.value(), self.verify_y_input.value())))
+        if isinstance(verify, dict) and verify.get('type') == 'pixel':
+            self.verify_checkbox.setChecked(True)
+            value = verify.get('value', [0, 0])
+            if isinstance(value, list) and len(value) == 2:
+                self.verify_x_input.setValue(value[0])
+                self.verify_y_input.setValue(value[1])
+            self.verify_color_input.setText(str(verify.get('color', '#000000')))
+        verify_layout.addWidget(self.verify_checkbox)
+        if isinstance(verify, dict) and verify.get('type') != 'pixel':
+            # Other conditions are kept as they are; they're edited in the scenario file
+            self.verify_checkbox.setEnabled(False)
+            verify_layout.addWidget(QLabel(f"Verify: {verify.get('type')} (kept as is)"))
+        else:
+            for label, widget in [("X:", self.verify_x_input), ("Y:", self.verify_y_input),
+                                  ("Color:", self.verify_color_input)]:
+                verify_layout.addWidget(QLabel(label))
+                verify_layout.addWidget(widget)
+            verify_layout.addWidget(verify_sample_btn)
+        layout.addLayout(verify_layout)
+        
         # Buttons
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("Save")
@@ -258,6 +476,100 @@ class StepEditorDialog(QDialog):
         elif step_type in ['keypress', 'type']:
             self.text_input = QLineEdit(str(self.step_data.get('value', '')))
             self.value_layout.addWidget(self.text_input)
+            
+            if step_type == 'type':
+                self.interval_input = QDoubleSpinBox()
+                self.interval_input.setRange(0, MAX_DELAY_SECONDS)
+                self.interval_input.setDecimals(3)
+                self.interval_input.setSingleStep(0.01)
+                self.interval_input.setValue(float(self.step_data.get('interval', DEFAULT_TYPE_INTERVAL)))
+                self.value_layout.addWidget(QLabel("Interval:"))
+                self.value_layout.addWidget(self.interval_input)
+        
+        elif step_type == 'path':
+            # Paths come from recording; they can be kept as-is but not hand-edited
+            points = self.step_data.get('value', []) if self.step_data.get('type') == 'path' else []
+            duration = points[-1][2] if points else 0
+            self.value_layout.addWidget(QLabel(f"{len(points)} recorded points over {duration:.2f} s"))
+        
+        elif step_type in ['image', 'wait_image']:
+            value = self.step_data.get('value', '') if self.step_data.get('type') in ['image', 'wait_image'] else ''
+            self.image_input = QLineEdit(str(value))
+            self.image_input.setPlaceholderText("Template image to find" + (" and click" if step_type == 'image' else ""))
+            browse_btn = QPushButton("Browse...")
+            browse_btn.clicked.connect(self.browse_image)
+            self.value_layout.addWidget(self.image_input)
+            self.value_layout.addWidget(browse_btn)
+            
+            self.confidence_input = QDoubleSpinBox()
+            self.confidence_input.setRange(0.5, 1.0)
+            self.confidence_input.setDecimals(2)
+            self.confidence_input.setSingleStep(0.05)
+            self.confidence_input.setValue(float(self.step_data.get('confidence', DEFAULT_CONFIDENCE)))
+            self.value_layout.addWidget(QLabel("Confidence:"))
+            self.value_layout.addWidget(self.confidence_input)
+            
+            if step_type == 'image':
+                self.add_timeout_inputs(DEFAULT_IMAGE_TIMEOUT, with_poll=False)
+                self.button_combo = QComboBox()
+                self.button_combo.addItems(['left', 'right', 'middle'])
+                self.button_combo.setCurrentText(self.step_data.get('button', 'left'))
+                self.value_layout.addWidget(QLabel("Button:"))
+                self.value_layout.addWidget(self.button_combo)
+            else:
+                self.add_timeout_inputs(DEFAULT_WAIT_TIMEOUT)
+        
+        elif step_type == 'wait_pixel':
+            value = self.step_data.get('value', [0, 0])
+            self.x_input = QSpinBox()
+            self.x_input.setRange(0, 10000)
+            self.y_input = QSpinBox()
+            self.y_input.setRange(0, 10000)
+            if isinstance(value, list) and len(value) == 2:
+                self.x_input.setValue(value[0])
+                self.y_input.setValue(value[1])
+            self.value_layout.addWidget(QLabel("X:"))
+            self.value_layout.addWidget(self.x_input)
+            self.value_layout.addWidget(QLabel("Y:"))
+            self.value_layout.addWidget(self.y_input)
+            
+            self.color_input = QLineEdit(str(self.step_data.get('color', '#000000')))
+            self.color_input.setPlaceholderText("#rrggbb")
+            self.color_input.setMaximumWidth(80)
+            sample_btn = QPushButton("Sample")
+            sample_btn.setToolTip("Use the color currently on screen at X, Y")
+            sample_btn.clicked.connect(self.sample_color)
+            self.value_layout.addWidget(QLabel("Color:"))
+            self.value_layout.addWidget(self.color_input)
+            self.value_layout.addWidget(sample_btn)
+            
+            self.tolerance_input = QSpinBox()
+            self.tolerance_input.setRange(0, 255)
+            self.tolerance_input.setValue(int(self.step_data.get('tolerance', DEFAULT_COLOR_TOLERANCE)))
+            self.value_layout.addWidget(QLabel("Tolerance:"))
+            self.value_layout.addWidget(self.tolerance_input)
+            self.add_timeout_inputs(DEFAULT_WAIT_TIMEOUT)
+        
+        elif step_type == 'wait_region_stable':
+            value = self.step_data.get('value', [0, 0, 100, 100])
+            if not (isinstance(value, list) and len(value) == 4):
+                value = [0, 0, 100, 100]
+            self.region_inputs = []
+            for label, number in zip(["Left:", "Top:", "Width:", "Height:"], value):
+                spinbox = QSpinBox()
+                spinbox.setRange(0 if label in ["Left:", "Top:"] else 1, 10000)
+                spinbox.setValue(int(number))
+                self.value_layout.addWidget(QLabel(label))
+                self.value_layout.addWidget(spinbox)
+                self.region_inputs.append(spinbox)
+            
+            self.stable_input = QDoubleSpinBox()
+            self.stable_input.setRange(0, 60)
+            self.stable_input.setSingleStep(0.1)
+            self.stable_input.setValue(float(self.step_data.get('stable', DEFAULT_STABLE_SECONDS)))
+            self.value_layout.addWidget(QLabel("Stable for:"))
+            self.value_layout.addWidget(self.stable_input)
+            self.add_timeout_inputs(DEFAULT_WAIT_TIMEOUT)
         
         elif step_type == 'scroll':
             self.scroll_input = QSpinBox()
@@ -267,11 +579,54 @@ class StepEditorDialog(QDialog):
         
         elif step_type == 'delay':
             self.delay_value_input = QDoubleSpinBox()
-            self.delay_value_input.setRange(0, 60)
+            self.delay_value_input.setRange(0, MAX_DELAY_SECONDS)
+            self.delay_value_input.setDecimals(3)
             self.delay_value_input.setSingleStep(0.1)
             self.delay_value_input.setValue(float(self.step_data.get('value', 1.0)))
             self.value_layout.addWidget(self.delay_value_input)
     
+    def add_timeout_inputs(self, default_timeout: float, with_poll: bool = True):
+        self.timeout_input = QDoubleSpinBox()
+        self.timeout_input.setRange(0, 600)
+        self.timeout_input.setSingleStep(0.5)
+        self.timeout_input.setValue(float(self.step_data.get('timeout', default_timeout)))
+        self.value_layout.addWidget(QLabel("Timeout:"))
+        self.value_layout.addWidget(self.timeout_input)
+        
+        if with_poll:
+            self.poll_input = QDoubleSpinBox()
+            self.poll_input.setRange(0.01, 5)
+            self.poll_input.setDecimals(2)
+            self.poll_input.setSingleStep(0.01)
+            self.poll_input.setValue(float(self.step_data.get('poll', DEFAULT_POLL_INTERVAL)))
+            self.value_layout.addWidget(QLabel("Poll:"))
+            self.value_layout.addWidget(self.poll_input)
+    
+    @staticmethod
+    def screen_color(x: int, y: int) -> str:
+        """Color currently on screen at (x, y), as '#rrggbb'"""
+        screen = QApplication.screenAt(QPoint(x, y)) or QApplication.primaryScreen()
+        geometry = screen.geometry()
+        return screen.grabWindow(0, x - geometry.x(), y - geometry.y(), 1, 1).toImage().pixelColor(0, 0).name()
+    
+    def sample_color(self):
+        self.color_input.setText(self.screen_color(self.x_input.value(), self.y_input.value()))
+    
+    def browse_image(self):
+        start = str(self.image_dir) if self.image_dir is not None else ""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Select Template Image", start, "Images (*.png *.jpg *.jpeg *.bmp);;All Files (*)"
+        )
+        if not file_path:
+            return
+        path = Path(file_path)
+        if self.image_dir is not None:
+            try:
+                path = path.resolve().relative_to(self.image_dir.resolve())
+            except ValueError:
+                pass
+        self.image_input.setText(path.as_posix())
+    
     def get_step_data(self) -> Dict[str, Any]:
         step_type = self.type_combo.currentText()
         step = {
@@ -287,6 +642,33 @@ class StepEditorDialog(QDialog):
         
         elif step_type in ['keypress', 'type']:
             step['value'] = self.text_input.text()
+            if step_type == 'type':
+                step['interval'] = self.interval_input.value()
+        
+        elif step_type == 'path':
+            step['value'] = self.step_data.get('value', []) if self.step_data.get('type') == 'path' else []
+        
+        elif step_type in ['image', 'wait_image']:
+            step['value'] = self.image_input.text().strip()
+            step['confidence'] = round(self.confidence_input.value(), 2)
+            step['timeout'] = self.timeout_input.value()
+            if step_type == 'image':
+                step['button'] = self.button_combo.currentText()
+            else:
+                step['poll'] = self.poll_input.value()
+        
+        elif step_type == 'wait_pixel':
+            step['value'] = [self.x_input.value(), self.y_input.value()]
+            step['color'] = self.color_input.text().strip()
+            step['tolerance'] = self.tolerance_input.value()
+            step['timeout'] = self.timeout_input.value()
+            step['poll'] = self.poll_input.value()
+        
+        elif step_type == 'wait_region_stable':
+            step['value'] = [spinbox.value() for spinbox in self.region_inputs]
+            step['stable'] = self.stable_input.value()
+            step['timeout'] = self.timeout_input.value()
+            step['poll'] = self.poll_input.value()
         
         elif step_type == 'scroll':
             step['value'] = self.scroll_input.value()
@@ -294,9 +676,118 @@ class StepEditorDialog(QDialog):
         elif step_type == 'delay':
             step['value'] = self.delay_value_input.value()
         
+        verify = self.step_data.get('verify')
+        if self.verify_checkbox.isChecked():
+            step['verify'] = dict(verify if isinstance(verify, dict) and verify.get('type') == 'pixel' else {},
+                                  type='pixel', value=[self.verify_x_input.value(), self.verify_y_input.value()],
+                                  color=self.verify_color_input.text().strip())
+        elif isinstance(verify, dict) and verify.get('type') != 'pixel':
+            step['verify'] = verify
+        
         return step
 
 
+class StepsTableModel(QAbstractTableModel):
+    """
+    Table model over a list of step dicts.
+    Cells are formatted only when the view asks for them, and every mutation
+    emits a fine-grained change signal instead of resetting the whole table.
+    """
+    HEADERS = ["#", "Name", "Type", "Value", "Delay"]
+    
+    def __init__(self, steps: Optional[List[Dict[str, Any]]] = None, parent=None):
+        super().__init__(parent)
+        self.steps = steps if steps is not None else []
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.steps)
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if column == 0:
+            return str(row + 1)
+        step = self.steps[row]
+        if column == 1:
+            return step.get('name', '')
+        if column == 2:
+            return step.get('type', '')
+        if column == 3:
+            if step.get('type') == 'path':
+                return f"{len(step.get('value', []))} points"
+            return str(step.get('value', ''))
+        return str(step.get('delay', ''))
+    
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    def set_steps(self, steps: Sequence[Dict[str, Any]]):
+        self.beginResetModel()
+        self.steps = steps
+        self.endResetModel()
+    
+    def _editable(self) -> List[Dict[str, Any]]:
+        """Lazily loaded scenarios are read-only sequences; copy into a list on first edit"""
+        if not isinstance(self.steps, list):
+            self.steps = list(self.steps)
+        return self.steps
+    
+    def append_steps(self, steps: List[Dict[str, Any]]):
+        if not steps:
+            return
+        first = len(self.steps)
+        self._editable()
+        self.beginInsertRows(QModelIndex(), first, first + len(steps) - 1)
+        self.steps.extend(steps)
+        self.endInsertRows()
+    
+    def replace_step(self, row: int, step: Dict[str, Any]):
+        self._editable()[row] = step
+        self.dataChanged.emit(self.index(row, 1), self.index(row, len(self.HEADERS) - 1))
+    
+    def replace_rows(self, first: int, count: int, steps: List[Dict[str, Any]]):
+        """Replace count rows starting at first with steps"""
+        self._editable()
+        if count:
+            self.beginRemoveRows(QModelIndex(), first, first + count - 1)
+            del self.steps[first:first + count]
+            self.endRemoveRows()
+        if steps:
+            self.beginInsertRows(QModelIndex(), first, first + len(steps) - 1)
+            self.steps[first:first] = steps
+            self.endInsertRows()
+        if count != len(steps) and first + len(steps) < len(self.steps):
+            self.dataChanged.emit(self.index(first + len(steps), 0), self.index(len(self.steps) - 1, 0))
+    
+    def remove_step(self, row: int):
+        self._editable()
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.steps[row]
+        self.endRemoveRows()
+        # Row numbers below the removed row shift by one
+        if row < len(self.steps):
+            self.dataChanged.emit(self.index(row, 0), self.index(len(self.steps) - 1, 0))
+    
+    def move_step(self, row: int, target: int):
+        """Move the step at row so it ends up at index target"""
+        if row == target:
+            return
+        # Qt's destination is the row the item is inserted before, in pre-move numbering
+        destination = target + 1 if target > row else target
+        self._editable()
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+        self.steps.insert(target, self.steps.pop(row))
+        self.endMoveRows()
+        low, high = min(row, target), max(row, target)
+        self.dataChanged.emit(self.index(low, 0), self.index(high, 0))
+
+
 class KeyKrakenMain(QMainWindow):
     """Main application window for KeyKraken"""
     
@@ -305,12 +796,41 @@ class KeyKrakenMain(QMainWindow):
         self.scenarios_dir = Path("scenarios")
         self.scenarios_dir.mkdir(exist_ok=True)
         self.current_scenario = None
-        self.current_steps = []
+        self.scenario_index = ScenarioIndex(self.scenarios_dir)
+        # Bring the index up to date while the widgets are being built
+        index_refresh = threading.Thread(target=self.scenario_index.refresh, daemon=True)
+        index_refresh.start()
+        self.scenario_files: Dict[str, Path] = {}
+        self.scenario_cache = ScenarioCache()
+        self.prefetcher = ScenarioPrefetcher(self.scenario_cache)
+        self.steps_model = StepsTableModel(parent=self)
         self.recorder = None
+        self.recording_start_row = 0
         self.executor = None
+        self.batch_executor = None
+        self.shown_progress = None
+        
+        self.saver = ScenarioSaver()
+        self.saver.save_finished.connect(self.on_scenario_saved)
+        self.saver.start()
+        
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(1000 // PROGRESS_FPS)
+        self.progress_timer.timeout.connect(self.on_progress_frame)
+        
+        # Keep the list live when other tools add, remove or rename scenarios;
+        # bursts of events are debounced into one index refresh
+        self.scenario_watch_timer = QTimer(self)
+        self.scenario_watch_timer.setSingleShot(True)
+        self.scenario_watch_timer.setInterval(SCENARIO_WATCH_DEBOUNCE_MS)
+        self.scenario_watch_timer.timeout.connect(self.sync_scenarios_list)
+        self.scenario_watcher = QFileSystemWatcher([str(self.scenarios_dir)], self)
+        self.scenario_watcher.directoryChanged.connect(lambda _path: self.scenario_watch_timer.start())
         
         self.init_ui()
-        self.load_scenarios_list()
+        index_refresh.join()
+        self.show_scenarios()
+        self.prefetch_recent()
         
     def init_ui(self):
         self.setWindowTitle("KeyKraken - Macro Automation")
@@ -353,11 +873,42 @@ class KeyKrakenMain(QMainWindow):
         header_label.setFont(QFont("Arial", 14, QFont.Bold))
         layout.addWidget(header_label)
         
+        # Filter and sort, answered from the scenario index
+        filter_layout = QHBoxLayout()
+        self.scenario_filter = QLineEdit()
+        self.scenario_filter.setPlaceholderText("Filter...")
+        self.scenario_filter.setClearButtonEnabled(True)
+        self.scenario_filter.textChanged.connect(self.show_scenarios)
+        filter_layout.addWidget(self.scenario_filter)
+        self.scenario_sort = QComboBox()
+        for label, key in (("Name", "name"), ("Modified", "modified"), ("Steps", "steps"), ("Size", "size")):
+            self.scenario_sort.addItem(label, key)
+        self.scenario_sort.currentIndexChanged.connect(self.show_scenarios)
+        filter_layout.addWidget(self.scenario_sort)
+        layout.addLayout(filter_layout)
+        
         # Scenarios list
         self.scenarios_list = QListWidget()
+        self.scenarios_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.scenarios_list.itemClicked.connect(self.on_scenario_selected)
         layout.addWidget(self.scenarios_list)
         
+        # Batch: run the selected scenarios in list order
+        batch_layout = QHBoxLayout()
+        batch_btn = QPushButton("⏭️ Run Selected")
+        batch_btn.setToolTip("Run the selected scenarios back-to-back (Ctrl/Shift+click to select several)")
+        batch_btn.clicked.connect(self.run_batch)
+        batch_layout.addWidget(batch_btn)
+        batch_layout.addWidget(QLabel("Gap"))
+        self.batch_gap_spinbox = QDoubleSpinBox()
+        self.batch_gap_spinbox.setRange(0, 600)
+        self.batch_gap_spinbox.setSingleStep(0.5)
+        self.batch_gap_spinbox.setValue(DEFAULT_GAP)
+        self.batch_gap_spinbox.setSuffix(" s")
+        self.batch_gap_spinbox.setToolTip("Pause between scenarios")
+        batch_layout.addWidget(self.batch_gap_spinbox)
+        layout.addLayout(batch_layout)
+        
         # Buttons
         btn_layout = QVBoxLayout()
         
@@ -403,11 +954,14 @@ class KeyKrakenMain(QMainWindow):
         steps_group = QGroupBox("Macro Steps")
         steps_layout = QVBoxLayout()
         
-        self.steps_table = QTableWidget()
-        self.steps_table.setColumnCount(5)
-        self.steps_table.setHorizontalHeaderLabels(["#", "Name", "Type", "Value", "Delay"])
+        self.steps_table = QTableView()
+        self.steps_table.setModel(self.steps_model)
         self.steps_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.steps_table.setSelectionBehavior(QTableWidget.SelectRows)
+        # Fixed row heights let the view lay out huge scenarios without measuring each row
+        self.steps_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.steps_table.verticalHeader().hide()
+        self.steps_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.steps_table.setSelectionMode(QAbstractItemView.SingleSelection)
         steps_layout.addWidget(self.steps_table)
         
         # Steps buttons
@@ -440,6 +994,23 @@ class KeyKrakenMain(QMainWindow):
         self.record_btn = QPushButton("🔴 Start Recording")
         self.record_btn.clicked.connect(self.toggle_recording)
         record_layout.addWidget(self.record_btn)
+        self.merge_typing_checkbox = QCheckBox("Merge typing")
+        self.merge_typing_checkbox.setToolTip(
+            "When recording stops, merge runs of typed characters into single Type steps"
+        )
+        self.merge_typing_checkbox.setChecked(True)
+        record_layout.addWidget(self.merge_typing_checkbox)
+        self.capture_moves_checkbox = QCheckBox("Record mouse moves")
+        self.capture_moves_checkbox.setToolTip(
+            "Capture the pointer path between clicks, simplified to within the tolerance"
+        )
+        record_layout.addWidget(self.capture_moves_checkbox)
+        self.move_tolerance_spinbox = QSpinBox()
+        self.move_tolerance_spinbox.setRange(1, 50)
+        self.move_tolerance_spinbox.setValue(int(DEFAULT_MOVE_TOLERANCE))
+        self.move_tolerance_spinbox.setSuffix(" px")
+        self.move_tolerance_spinbox.setToolTip("Path simplification tolerance")
+        record_layout.addWidget(self.move_tolerance_spinbox)
         steps_layout.addLayout(record_layout)
         
         steps_group.setLayout(steps_layout)
@@ -457,9 +1028,32 @@ class KeyKrakenMain(QMainWindow):
         self.iterations_spinbox.setFixedWidth(80)
         iterations_layout.addWidget(self.iterations_spinbox)
         iterations_layout.addWidget(QLabel("time(s)"))
+        self.precise_timing_checkbox = QCheckBox("Precise timing")
+        self.precise_timing_checkbox.setToolTip(
+            "Schedule steps on absolute deadlines so delays don't drift over long runs"
+        )
+        iterations_layout.addWidget(self.precise_timing_checkbox)
+        self.adaptive_checkbox = QCheckBox("Adaptive delays")
+        self.adaptive_checkbox.setToolTip(
+            "Learn how short the delays of steps with a verify condition can be, and shorten them on later runs"
+        )
+        iterations_layout.addWidget(self.adaptive_checkbox)
+        iterations_layout.addWidget(QLabel("Speed"))
+        self.speed_spinbox = QDoubleSpinBox()
+        self.speed_spinbox.setRange(MacroExecutor.MIN_SPEED, MacroExecutor.MAX_SPEED)
+        self.speed_spinbox.setSingleStep(0.25)
+        self.speed_spinbox.setValue(1.0)
+        self.speed_spinbox.setSuffix("x")
+        self.speed_spinbox.setFixedWidth(80)
+        iterations_layout.addWidget(self.speed_spinbox)
         iterations_layout.addStretch()
         action_layout.addLayout(iterations_layout)
         
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["JSON", "Binary"])
+        self.format_combo.setToolTip("Binary scenarios open instantly, however large they are")
+        action_layout.addWidget(self.format_combo)
+        
         save_btn = QPushButton("💾 Save Scenario")
         save_btn.clicked.connect(self.save_scenario)
         action_layout.addWidget(save_btn)
@@ -468,49 +1062,114 @@ class KeyKrakenMain(QMainWindow):
         execute_btn.clicked.connect(self.execute_scenario)
         action_layout.addWidget(execute_btn)
         
+        self.stop_btn = QPushButton("⏹️ Stop")
+        self.stop_btn.setToolTip("Stop the running scenario or batch, including during the countdown")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.clicked.connect(self.stop_execution)
+        action_layout.addWidget(self.stop_btn)
+        
         layout.addLayout(action_layout)
         
         return panel
     
     def load_scenarios_list(self):
-        self.scenarios_list.clear()
-        for file in self.scenarios_dir.glob("*.json"):
-            self.scenarios_list.addItem(file.stem)
+        self.scenario_index.refresh()
+        self.show_scenarios()
+        self.prefetch_recent()
+    
+    def prefetch_recent(self):
+        recent = self.scenario_index.entries(sort='modified')[:PREFETCH_RECENT]
+        self.prefetcher.prefetch(entry['path'] for entry in recent)
+    
+    def sync_scenarios_list(self):
+        """Apply changes in the scenarios folder to the list"""
+        changed, removed = self.scenario_index.refresh()
+        if changed or removed:
+            self.show_scenarios()
+    
+    def show_scenarios(self):
+        """
+        Bring the list in line with the index for the current filter and sort order.
+        Existing items are kept and moved rather than rebuilt, so selection and
+        scroll position survive updates.
+        """
+        entries = self.scenario_index.entries(
+            sort=self.scenario_sort.currentData(), text=self.scenario_filter.text()
+        )
+        items = {self.scenarios_list.item(row).text(): self.scenarios_list.item(row)
+                 for row in range(self.scenarios_list.count())}
+        self.scenario_files = {}
+        for position, entry in enumerate(entries):
+            stem = entry['stem']
+            self.scenario_files[stem] = entry['path']
+            item = items.pop(stem, None)
+            if item is None:
+                item = QListWidgetItem(stem)
+                self.scenarios_list.insertItem(position, item)
+            elif self.scenarios_list.row(item) != position:
+                self.scenarios_list.insertItem(position, self.scenarios_list.takeItem(self.scenarios_list.row(item)))
+            self.describe_scenario_item(item, entry)
+        for item in items.values():
+            self.scenarios_list.takeItem(self.scenarios_list.row(item))
+    
+    def describe_scenario_item(self, item: QListWidgetItem, entry: Dict[str, Any]):
+        types = ", ".join(f"{count} {step_type}" for step_type, count
+                          in sorted(entry['type_counts'].items(), key=lambda kv: -kv[1]))
+        tooltip = [entry['description'] or entry['name'],
+                   f"{entry['step_count']} steps" + (f": {types}" if types else ""),
+                   f"{entry['path'].name}, {entry['size'] / 1024:.1f} KB"]
+        if entry['error']:
+            tooltip.append(f"Unreadable: {entry['error']}")
+            item.setForeground(QColor("red"))
+        else:
+            item.setForeground(self.scenarios_list.palette().text())
+        item.setToolTip("\n".join(tooltip))
     
     def on_scenario_selected(self, item):
         scenario_name = item.text()
         self.load_scenario(scenario_name)
+        self.prefetch_neighbours(self.scenarios_list.row(item))
+    
+    def prefetch_neighbours(self, row: int):
+        rows = [row + offset for distance in range(1, PREFETCH_NEIGHBOURS + 1)
+                for offset in (distance, -distance)]
+        paths = [self.scenario_files.get(self.scenarios_list.item(r).text())
+                 for r in rows if 0 <= r < self.scenarios_list.count()]
+        self.prefetcher.prefetch(path for path in paths if path is not None)
     
     def load_scenario(self, scenario_name: str):
-        scenario_path = self.scenarios_dir / f"{scenario_name}.json"
-        if not scenario_path.exists():
+        scenario_path = self.scenario_files.get(scenario_name)
+        if scenario_path is None or not scenario_path.exists():
             QMessageBox.warning(self, "Error", f"Scenario file not found: {scenario_name}")
             return
         
         try:
-            with open(scenario_path, 'r') as f:
-                data = json.load(f)
+            data = self.scenario_cache.get(scenario_path)
             
             self.current_scenario = scenario_name
+            self.format_combo.setCurrentText(
+                "Binary" if scenario_path.suffix == BINARY_EXTENSION else "JSON"
+            )
             self.name_input.setText(data.get('name', ''))
             self.description_input.setPlainText(data.get('description', ''))
             self.current_steps = data.get('steps', [])
-            self.refresh_steps_table()
             
             self.statusBar().showMessage(f"Loaded scenario: {scenario_name}")
         
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load scenario: {str(e)}")
     
-    def refresh_steps_table(self):
-        self.steps_table.setRowCount(len(self.current_steps))
-        
-        for idx, step in enumerate(self.current_steps):
-            self.steps_table.setItem(idx, 0, QTableWidgetItem(str(idx + 1)))
-            self.steps_table.setItem(idx, 1, QTableWidgetItem(step.get('name', '')))
-            self.steps_table.setItem(idx, 2, QTableWidgetItem(step.get('type', '')))
-            self.steps_table.setItem(idx, 3, QTableWidgetItem(str(step.get('value', ''))))
-            self.steps_table.setItem(idx, 4, QTableWidgetItem(str(step.get('delay', ''))))
+    @property
+    def current_steps(self) -> Sequence[Dict[str, Any]]:
+        return self.steps_model.steps
+    
+    @current_steps.setter
+    def current_steps(self, steps: Sequence[Dict[str, Any]]):
+        self.steps_model.set_steps(steps)
+    
+    def selected_step_row(self) -> int:
+        index = self.steps_table.currentIndex()
+        return index.row() if index.isValid() else -1
     
     def new_scenario(self):
         name, ok = QInputDialog.getText(self, "New Scenario", "Enter scenario name:")
@@ -519,7 +1178,6 @@ class KeyKrakenMain(QMainWindow):
             self.name_input.setText(name)
             self.description_input.clear()
             self.current_steps = []
-            self.refresh_steps_table()
             self.statusBar().showMessage(f"Created new scenario: {name}")
     
     def delete_scenario(self):
@@ -534,62 +1192,58 @@ class KeyKrakenMain(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            scenario_path = self.scenarios_dir / f"{self.current_scenario}.json"
-            if scenario_path.exists():
-                scenario_path.unlink()
+            for scenario_path in scenario_paths(self.scenarios_dir, self.current_scenario):
+                self.scenario_cache.discard(scenario_path)
+                if scenario_path.exists():
+                    scenario_path.unlink()
+            learned = tuning_path(self.scenarios_dir / f"{self.current_scenario}{JSON_EXTENSION}")
+            if learned.exists():
+                learned.unlink()
             self.load_scenarios_list()
             self.current_scenario = None
             self.name_input.clear()
             self.description_input.clear()
             self.current_steps = []
-            self.refresh_steps_table()
             self.statusBar().showMessage("Scenario deleted")
     
     def add_step(self):
-        dialog = StepEditorDialog(self)
+        dialog = StepEditorDialog(self, image_dir=self.scenarios_dir)
         if dialog.exec():
             step_data = dialog.get_step_data()
-            self.current_steps.append(step_data)
-            self.refresh_steps_table()
+            self.steps_model.append_steps([step_data])
     
     def edit_step(self):
-        row = self.steps_table.currentRow()
+        row = self.selected_step_row()
         if row < 0:
             QMessageBox.warning(self, "Warning", "Please select a step to edit")
             return
         
-        dialog = StepEditorDialog(self, self.current_steps[row])
+        dialog = StepEditorDialog(self, self.current_steps[row], self.scenarios_dir)
         if dialog.exec():
-            self.current_steps[row] = dialog.get_step_data()
-            self.refresh_steps_table()
+            self.steps_model.replace_step(row, dialog.get_step_data())
     
     def delete_step(self):
-        row = self.steps_table.currentRow()
+        row = self.selected_step_row()
         if row < 0:
             QMessageBox.warning(self, "Warning", "Please select a step to delete")
             return
         
-        del self.current_steps[row]
-        self.refresh_steps_table()
+        self.steps_model.remove_step(row)
     
     def move_step_up(self):
-        row = self.steps_table.currentRow()
+        row = self.selected_step_row()
         if row <= 0:
             return
         
-        self.current_steps[row], self.current_steps[row-1] = \
-            self.current_steps[row-1], self.current_steps[row]
-        self.refresh_steps_table()
+        self.steps_model.move_step(row, row - 1)
         self.steps_table.selectRow(row - 1)
     
     def move_step_down(self):
-        row = self.steps_table.currentRow()
+        row = self.selected_step_row()
         if row < 0 or row >= len(self.current_steps) - 1:
             return
         
-        self.current_steps[row], self.current_steps[row+1] = \
-            self.current_steps[row+1], self.current_steps[row]
-        self.refresh_steps_table()
+        self.steps_model.move_step(row, row + 1)
         self.steps_table.selectRow(row + 1)
     
     def toggle_recording(self):
@@ -598,20 +1252,40 @@ class KeyKrakenMain(QMainWindow):
             self.record_btn.setText("🔴 Start Recording")
             self.statusBar().showMessage("Recording stopped")
         else:
-            self.recorder = MacroRecorder()
-            self.recorder.step_recorded.connect(self.on_step_recorded)
+            self.recording_start_row = len(self.current_steps)
+            self.recorder = MacroRecorder(
+                capture_moves=self.capture_moves_checkbox.isChecked(),
+                move_tolerance=self.move_tolerance_spinbox.value()
+            )
+            self.recorder.steps_recorded.connect(self.on_steps_recorded)
             self.recorder.recording_stopped.connect(self.on_recording_stopped)
-            self.recorder.start()
+            self.recorder.start_recording()
             self.record_btn.setText("⏹️ Stop Recording")
             self.statusBar().showMessage("Recording... (move mouse to top-left corner to stop)")
     
-    def on_step_recorded(self, step: Dict):
-        self.current_steps.append(step)
-        self.refresh_steps_table()
+    def on_steps_recorded(self, steps: List[Dict]):
+        self.steps_model.append_steps(steps)
     
     def on_recording_stopped(self):
         self.record_btn.setText("🔴 Start Recording")
-        self.statusBar().showMessage("Recording complete")
+        message = "Recording complete"
+        
+        recorded = self.recorder.steps
+        first = self.recording_start_row
+        rows = self.current_steps[first:first + len(recorded)]
+        # Only merge if the recorded rows weren't edited while recording
+        if (self.merge_typing_checkbox.isChecked() and len(rows) == len(recorded)
+                and all(a is b for a, b in zip(rows, recorded))):
+            merged = coalesce_keypresses(recorded)
+            if len(merged) < len(recorded):
+                self.steps_model.replace_rows(first, len(recorded), merged)
+                message += f" ({len(recorded)} steps merged into {len(merged)})"
+        
+        paths = self.recorder.path_builder
+        if paths.raw_count:
+            message += f", {paths.raw_count} pointer samples kept as {paths.kept_count} path points"
+        
+        self.statusBar().showMessage(message)
     
     def save_scenario(self):
         name = self.name_input.text().strip()
@@ -627,19 +1301,34 @@ class KeyKrakenMain(QMainWindow):
             "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
-        scenario_path = self.scenarios_dir / f"{name}.json"
+        extension = BINARY_EXTENSION if self.format_combo.currentText() == "Binary" else JSON_EXTENSION
+        scenario_path = self.scenarios_dir / f"{name}{extension}"
+        # Saving in the other format converts the scenario rather than duplicating it
+        other_paths = [path for path in scenario_paths(self.scenarios_dir, name) if path != scenario_path]
         
-        try:
-            with open(scenario_path, 'w') as f:
-                json.dump(scenario_data, f, indent=4)
-            
-            self.current_scenario = name
-            self.load_scenarios_list()
-            self.statusBar().showMessage(f"Scenario saved: {name}")
-            QMessageBox.information(self, "Success", "Scenario saved successfully!")
+        # Snapshot the rows: the saver writes them while editing goes on
+        steps = scenario_data["steps"]
+        if isinstance(steps, list):
+            scenario_data["steps"] = list(steps)
         
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save scenario: {str(e)}")
+        self.current_scenario = name
+        self.saver.save(name, scenario_path, scenario_data, other_paths)
+        self.statusBar().showMessage(f"Saving scenario: {name}...")
+    
+    def on_scenario_saved(self, name: str, path: str, error: str):
+        if error:
+            self.statusBar().showMessage(f"Failed to save scenario: {name}")
+            QMessageBox.critical(self, "Error", f"Failed to save scenario: {error}")
+            return
+        self.sync_scenarios_list()
+        self.statusBar().showMessage(f"Scenario saved: {name}")
+    
+    def closeEvent(self, event):
+        # Let queued saves reach the disk before the window goes away
+        self.saver.stop()
+        self.saver.wait()
+        self.prefetcher.shutdown()
+        super().closeEvent(event)
     
     def execute_scenario(self):
         if not self.current_steps:
@@ -650,33 +1339,136 @@ class KeyKrakenMain(QMainWindow):
         
         reply = QMessageBox.question(
             self, "Execute Scenario",
-            f"Execute {len(self.current_steps)} steps {iterations} time(s)?\n\nYou have 3 seconds to position windows.",
+            f"Execute {len(self.current_steps)} steps {iterations} time(s)?\n\n"
+            f"You have {COUNTDOWN_SECONDS} seconds to position windows.",
             QMessageBox.Yes | QMessageBox.No
         )
         
         if reply != QMessageBox.Yes:
             return
         
-        # 3 second countdown
-        time.sleep(3)
-        
-        self.executor = MacroExecutor(self.current_steps, iterations)
-        self.executor.step_executed.connect(self.on_step_executed)
+        timing = 'deadline' if self.precise_timing_checkbox.isChecked() else 'relative'
+        # Snapshot the steps so edits made while running can't shift progress indices;
+        # lazily loaded steps are read-only already and are streamed, not copied
+        steps = self.current_steps
+        if isinstance(steps, list):
+            steps = list(steps)
+        tuner = None
+        if self.adaptive_checkbox.isChecked() and self.current_scenario:
+            scenario_file = self.scenario_files.get(self.current_scenario,
+                                                    self.scenarios_dir / f"{self.current_scenario}{JSON_EXTENSION}")
+            tuner = DelayTuner(tuning_path(scenario_file), steps)
+        self.executor = MacroExecutor(steps, iterations, timing, speed=self.speed_spinbox.value(),
+                                      base_dir=self.scenarios_dir, tuner=tuner,
+                                      start_delay=COUNTDOWN_SECONDS)
         self.executor.execution_finished.connect(self.on_execution_finished)
-        if hasattr(self.executor, 'iteration_started'):
-            self.executor.iteration_started.connect(self.on_iteration_started)
+        self.shown_progress = None
         self.executor.start()
+        self.progress_timer.start()
+        self.stop_btn.setEnabled(True)
         
-        self.statusBar().showMessage("Executing scenario...")
+        self.statusBar().showMessage(f"Executing scenario in {COUNTDOWN_SECONDS} seconds...")
+    
+    def run_batch(self):
+        rows = sorted(self.scenarios_list.row(item) for item in self.scenarios_list.selectedItems())
+        paths = [self.scenario_files[self.scenarios_list.item(row).text()] for row in rows]
+        if not paths:
+            QMessageBox.warning(self, "Warning", "Select the scenarios to run")
+            return
+        
+        iterations = self.iterations_spinbox.value()
+        reply = QMessageBox.question(
+            self, "Run Scenarios",
+            f"Run {len(paths)} scenario(s) back-to-back, {iterations} time(s) each?\n\n"
+            f"You have {COUNTDOWN_SECONDS} seconds to position windows.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        
+        timing = 'deadline' if self.precise_timing_checkbox.isChecked() else 'relative'
+        self.batch_executor = BatchExecutor(
+            paths, iterations=iterations, timing=timing, speed=self.speed_spinbox.value(),
+            gap=self.batch_gap_spinbox.value(), start_delay=COUNTDOWN_SECONDS,
+            adaptive=self.adaptive_checkbox.isChecked()
+        )
+        self.batch_executor.batch_event.connect(self.on_batch_event)
+        self.batch_executor.batch_finished.connect(self.on_batch_finished)
+        self.shown_progress = None
+        self.batch_executor.start()
+        self.progress_timer.start()
+        self.stop_btn.setEnabled(True)
+        self.statusBar().showMessage(f"Starting batch of {len(paths)} scenario(s)...")
+    
+    def on_batch_event(self, event: str, fields: Dict[str, Any]):
+        if event == 'scenario_started':
+            self.statusBar().showMessage(
+                f"Scenario {fields['scenario']}/{fields['scenarios']}: {fields['name']}"
+            )
+        elif event == 'scenario_finished' and not fields['success']:
+            self.statusBar().showMessage(f"{fields['name']}: {fields['message']}")
+    
+    def stop_execution(self):
+        if self.batch_executor is not None:
+            self.batch_executor.stop()
+        elif self.executor is not None:
+            self.executor.stop()
+        self.stop_btn.setEnabled(False)
+        self.statusBar().showMessage("Stopping...")
     
-    def on_step_executed(self, step_idx: int, message: str):
-        self.statusBar().showMessage(f"Step {step_idx + 1}/{len(self.current_steps)}: {message}")
+    def on_batch_finished(self, success: bool, message: str):
+        self.progress_timer.stop()
+        self.stop_btn.setEnabled(False)
+        self.batch_executor = None
+        self.statusBar().showMessage("Batch complete" if success else "Batch finished with failures")
+        if success:
+            QMessageBox.information(self, "Batch Complete", message)
+        else:
+            QMessageBox.warning(self, "Batch Result", message)
+    
+    def set_progress_fps(self, fps: int):
+        self.progress_timer.setInterval(1000 // max(1, fps))
+    
+    def on_progress_frame(self):
+        """Show the executor's latest progress; intermediate steps are simply skipped"""
+        if self.batch_executor is not None:
+            self.show_batch_progress()
+            return
+        if self.executor is None:
+            return
+        progress = self.executor.progress
+        if progress is None or progress == self.shown_progress:
+            return
+        self.shown_progress = progress
+        iteration, step_idx = progress
+        steps = self.executor.steps
+        self.statusBar().showMessage(
+            f"Step {step_idx + 1}/{len(steps)}: [{iteration}/{self.executor.iterations}] "
+            f"Executing: {steps[step_idx].get('name', '')}"
+        )
         self.steps_table.selectRow(step_idx)
     
-    def on_iteration_started(self, current: int, total: int):
-        self.statusBar().showMessage(f"Starting iteration {current} of {total}")
+    def show_batch_progress(self):
+        progress = self.batch_executor.progress
+        if progress is None or progress == self.shown_progress:
+            return
+        self.shown_progress = progress
+        number, count, iteration, step_idx = progress
+        steps = self.batch_executor.current_steps
+        name = steps[step_idx].get('name', '') if step_idx < len(steps) else ''
+        self.statusBar().showMessage(
+            f"Scenario {number}/{count}, step {step_idx + 1}/{len(steps)} [{iteration}]: {name}"
+        )
     
     def on_execution_finished(self, success: bool, message: str):
+        self.progress_timer.stop()
+        self.stop_btn.setEnabled(False)
+        if self.executor.tuner is not None:
+            # Learned delays are kept even if the run failed or was stopped
+            try:
+                self.executor.tuner.save()
+            except OSError as e:
+                message = f"{message} (could not save learned delays: {e})"
         self.statusBar().showMessage(message)
         if success:
             QMessageBox.information(self, "Success", message)
@@ -685,15 +1477,12 @@ class KeyKrakenMain(QMainWindow):
 
 
 class SplashScreen(QDialog):
-    """Splash screen with header image"""
+    """Splash screen with header image, shown while the main window is built"""
     
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint)
         self.init_ui()
-        
-        # Auto close after 2 seconds
-        QTimer.singleShot(2000, self.accept)
     
     def init_ui(self):
         layout = QVBoxLayout()
@@ -717,17 +1506,24 @@ class SplashScreen(QDialog):
         self.setLayout(layout)
 
 
-def main():
-    app = QApplication(sys.argv)
-    app.setApplicationName("KeyKraken")
-    
-    # Show splash screen
+def show_main_window(app: QApplication) -> KeyKrakenMain:
+    """Show the splash, build the main window behind it, then swap them"""
     splash = SplashScreen()
-    splash.exec()
+    splash.show()
+    # Paint the splash before the event loop is blocked building the window
+    app.processEvents()
     
-    # Show main window
     window = KeyKrakenMain()
     window.show()
+    splash.close()
+    return window
+
+
+def main():
+    app = QApplication(sys.argv)
+    app.setApplicationName("KeyKraken")
+    
+    window = show_main_window(app)
     
     sys.exit(app.exec())
 
@@ -0,0 +1,350 @@
+"""
+KeyKraken benchmarks
+Run from the repository root: python -m utils.benchmark <name>
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Scenarios that keep the executor busy well past the stop request
+STOP_CASES = {
+    "delay step": [{"name": "Wait", "type": "delay", "value": 60, "delay": 0}],
+    "step delay": [{"name": "Click", "type": "click", "value": [0, 0], "delay": 10}],
+    "type": [{"name": "Type", "type": "type", "value": "x" * 2000, "delay": 0}],
+}
+
+
+def _trace_executor(steps, iterations=1, timing='relative', record=True):
+    from utils.engine import MacroEngine
+    from utils.input_backend import TraceBackend
+    return MacroEngine(steps, iterations, timing, backend=TraceBackend(record=record))
+
+
+def bench_stop_latency(runs: int = 5, settle: float = 0.2):
+    """Time from MacroEngine.stop() to the run loop returning, per step type"""
+    print(f"{'case':<12} {'timing':<9} {'median':>10} {'max':>10}")
+    for case, steps in STOP_CASES.items():
+        for timing in ('relative', 'deadline'):
+            samples = []
+            for _ in range(runs):
+                executor = _trace_executor(steps, 1, timing, record=False)
+                thread = threading.Thread(target=executor.run)
+                thread.start()
+                time.sleep(settle)
+                started = time.perf_counter()
+                executor.stop()
+                thread.join()
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f"{case:<12} {timing:<9} {statistics.median(samples):>7.2f} ms "
+                  f"{max(samples):>7.2f} ms")
+
+
+def _zero_delay_steps(count: int):
+    kinds = [
+        {"type": "click", "value": [100, 200], "button": "left"},
+        {"type": "keypress", "value": "tab"},
+        {"type": "move", "value": [300, 400]},
+        {"type": "scroll", "value": -3},
+    ]
+    return [dict(kinds[i % len(kinds)], name=f"Step {i + 1}", delay=0) for i in range(count)]
+
+
+def bench_throughput(step_count: int = 500, iterations: int = 200):
+    """Executor overhead per step with zero delays and a null backend"""
+    executor = _trace_executor(_zero_delay_steps(step_count), iterations, record=False)
+    started = time.perf_counter()
+    executor.run()
+    elapsed = time.perf_counter() - started
+    total = step_count * iterations
+    print(f"{total} steps in {elapsed:.3f} s: {total / elapsed:,.0f} steps/s, "
+          f"{elapsed / total * 1e6:.2f} us/step")
+
+
+def bench_timing_accuracy(step_count: int = 50, iterations: int = 10, delay: float = 0.005):
+    """Gap between consecutive emitted events versus the scripted delay, per timing mode"""
+    steps = [dict(step, delay=delay) for step in _zero_delay_steps(step_count)]
+    expected = (step_count * iterations) * delay
+    for timing in ('relative', 'deadline'):
+        executor = _trace_executor(steps, iterations, timing)
+        started = time.perf_counter()
+        executor.run()
+        elapsed = time.perf_counter() - started
+        stamps = [event[0] for event in executor.backend.events]
+        errors = [abs((b - a) / 1e6 - delay * 1000) for a, b in zip(stamps, stamps[1:])]
+        print(f"{timing:<9} total {elapsed:.3f} s (scripted {expected:.3f} s), "
+              f"gap error mean {statistics.mean(errors):.3f} ms max {max(errors):.3f} ms")
+
+    # Steps that take time themselves, each followed by evenly spaced clicks
+    lead_ins = {
+        "type": {"type": "type", "value": "x" * 11, "interval": 0.05, "delay": 0.1},
+        "path": {"type": "path", "value": [[0, 0, 0.0], [200, 100, 0.25], [400, 0, 0.5]], "delay": 0.1},
+    }
+    for kind, lead_in in lead_ins.items():
+        steps = [lead_in] + [{"type": "click", "value": [0, 0], "delay": 0.1} for _ in range(5)]
+        for timing in ('relative', 'deadline'):
+            executor = _trace_executor(steps, 1, timing)
+            executor.run()
+            clicks = [event[0] for event in executor.backend.events if event[1] == 'click']
+            gaps = [(b - a) / 1e6 for a, b in zip(clicks, clicks[1:])]
+            print(f"{timing:<9} after a 0.5 s {kind} step: click gaps mean {statistics.mean(gaps):.1f} ms "
+                  f"(scripted 100.0 ms), min {min(gaps):.1f} ms")
+
+
+def _synthetic_pointer_session(seed: int = 7, moves: int = 40, rate_hz: int = 125):
+    """Human-like pointer samples: minimum-jerk reaches with jitter and hover pauses"""
+    rng = random.Random(seed)
+    t_ns, x, y = 0, 960.0, 540.0
+    step_ns = 1_000_000_000 // rate_hz
+    samples = []
+    for _ in range(moves):
+        target_x, target_y = rng.uniform(0, 1920), rng.uniform(0, 1080)
+        frames = int(rng.uniform(0.3, 1.2) * rate_hz)
+        # Slight arc so the reach isn't a perfect line
+        bend_x, bend_y = rng.uniform(-80, 80), rng.uniform(-80, 80)
+        start_x, start_y = x, y
+        for frame in range(1, frames + 1):
+            s = frame / frames
+            s = 10 * s ** 3 - 15 * s ** 4 + 6 * s ** 5
+            arc = 4 * s * (1 - s)
+            x = start_x + (target_x - start_x) * s + bend_x * arc
+            y = start_y + (target_y - start_y) * s + bend_y * arc
+            t_ns += step_ns
+            samples.append((t_ns, int(x + rng.uniform(-1, 1)), int(y + rng.uniform(-1, 1))))
+        t_ns += int(rng.uniform(0.2, 1.5) * 1e9)
+    return samples
+
+
+def bench_path_compression(tolerances=(1, 3, 5, 10)):
+    """Pointer samples kept per recorded path at several pixel tolerances"""
+    from utils.recording import PathBuilder
+    samples = _synthetic_pointer_session()
+    for tolerance in tolerances:
+        builder = PathBuilder(tolerance)
+        started = time.perf_counter()
+        for sample in samples:
+            builder.add(*sample)
+        builder.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"tolerance {tolerance:>2} px: {builder.raw_count} samples -> {builder.kept_count} points "
+              f"({builder.raw_count / builder.kept_count:.1f}x) in {elapsed:.1f} ms")
+
+
+def bench_image_match(width: int = 1920, height: int = 1080, size: int = 64, runs: int = 10):
+    """Time to find a template on a synthetic screen: full search, then around the last hit"""
+    try:
+        import numpy as np
+        from utils.image_match import ImageLocator, Template
+    except ImportError as e:
+        print(f"skipped: needs NumPy ({e})")
+        return
+    rng = np.random.default_rng(7)
+    # Smooth random texture, so coarse pyramid levels still carry structure
+    screen = rng.random((height // 8 + 1, width // 8 + 1)).astype(np.float32)
+    screen = np.kron(screen, np.ones((8, 8), dtype=np.float32))[:height, :width] * 255
+    screen += rng.normal(0, 4, screen.shape).astype(np.float32)
+    left, top = width * 3 // 5 + 3, height * 2 // 5 + 5
+    template = Template(screen[top:top + size, left:left + size].copy())
+
+    for label, warm in (("full screen", False), ("around last hit", True)):
+        samples = []
+        for _ in range(runs):
+            locator = ImageLocator(lambda region: screen if region is None else
+                                   screen[region[1]:region[1] + region[3], region[0]:region[0] + region[2]],
+                                   load=lambda path: template)
+            if warm:
+                locator.find("template")
+            hit = locator.find("template")
+            samples.append(locator.last_search_ms)
+        found = hit is not None and (hit[0], hit[1]) == (left + size // 2, top + size // 2)
+        print(f"{label:<16} {width}x{height}, {size}px template: median {statistics.median(samples):6.1f} ms, "
+              f"found: {found}")
+
+
+def bench_capture(width: int = 1920, height: int = 1080, runs: int = 20):
+    """Cost of tile-hashing a full screen and a small region, and of a shared-frame lookup"""
+    try:
+        import numpy as np
+        from utils.screen_capture import ScreenCapture
+    except ImportError as e:
+        print(f"skipped: needs NumPy ({e})")
+        return
+    screen = np.random.default_rng(7).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    capture = ScreenCapture(lambda region: screen if region is None else
+                            screen[region[1]:region[1] + region[3], region[0]:region[0] + region[2]])
+    for label, region in (("full screen", None), ("300x200 region", (800, 400, 300, 200))):
+        samples = []
+        for _ in range(runs):
+            capture.invalidate()
+            started = time.perf_counter()
+            capture.hashes(region)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"tile hashes, {label:<15} median {statistics.median(samples):6.2f} ms")
+    capture.invalidate()
+    capture.capture()
+    started = time.perf_counter()
+    for _ in range(1000):
+        capture.pixel(960, 540, max_age=60)
+    print(f"pixel lookup from a shared frame: {(time.perf_counter() - started) * 1000:.2f} us each "
+          f"({capture.grabs} grab(s), {capture.reuses} reuses)")
+
+
+def bench_validation(scenario_count: int = 200, steps_per_scenario: int = 50):
+    """Cold, pooled and cached validation of a scenario folder; capitals must pass the key checks"""
+    import string
+    import tempfile
+    from pathlib import Path
+    from utils.validator import ValidationSettings, validate_directory
+
+    try:
+        import pyautogui
+        key_names = frozenset(pyautogui.KEYBOARD_KEYS)
+    except Exception:
+        # Same shape as pyautogui.KEYBOARD_KEYS: letters in lower case only
+        key_names = frozenset(string.ascii_lowercase + string.digits + string.punctuation + ' ') | {
+            'enter', 'tab', 'shift', 'ctrl', 'alt', 'pageup', 'pagedown', 'f5'}
+    settings = ValidationSettings((1920, 1080), key_names)
+    steps = [
+        {"type": "keypress", "value": "A", "delay": 0.1},
+        {"type": "keypress", "value": "Enter", "delay": 0.1},
+        {"type": "type", "value": "Hello World!", "interval": 0.01, "delay": 0.1},
+    ]
+    steps += [{"type": "click", "value": [i % 1920, i % 1080], "delay": 0.05}
+              for i in range(steps_per_scenario - len(steps))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(scenario_count):
+            with open(Path(directory) / f"scenario_{i:04d}.json", 'w') as f:
+                json.dump({"name": f"Scenario {i}", "steps": steps}, f)
+        for label, jobs in (("cold, 1 process", 1), ("cold, pool", None), ("cached", None)):
+            started = time.perf_counter()
+            report = validate_directory(directory, settings, jobs=jobs, use_cache=label == "cached")
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{label:<16} {scenario_count} scenarios: {elapsed:7.1f} ms "
+                  f"({report['summary']['cached']} cached)")
+            if label == "cold, 1 process":
+                # Seed the cache for the cached pass
+                validate_directory(directory, settings, jobs=1)
+
+    problems = [issue["message"] for scenario in report["scenarios"]
+                for issue in scenario["errors"] + scenario["warnings"]]
+    if problems:
+        raise RuntimeError(f"capital letters reported as problems: {sorted(set(problems))}")
+    print("capital letters in keypress and type steps: no problems reported")
+
+
+# Run in a fresh interpreter: imports keykraken, then starts the GUI as main()
+# does and reports when the splash and the main window first paint
+FIRST_PAINT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import keykraken
+imported = time.perf_counter()
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+painted = {}
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            for cls in (keykraken.SplashScreen, keykraken.KeyKrakenMain):
+                if isinstance(obj, cls) and cls.__name__ not in painted:
+                    painted[cls.__name__] = time.perf_counter()
+                    if cls is keykraken.KeyKrakenMain:
+                        QTimer.singleShot(0, app.quit)
+        return False
+
+app = QApplication(sys.argv)
+watcher = FirstPaint()
+app.installEventFilter(watcher)
+window = keykraken.show_main_window(app)
+QTimer.singleShot(10000, app.quit)
+app.exec()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "splash_ms": (painted.get("SplashScreen", float("nan")) - started) * 1000,
+    "window_ms": (painted.get("KeyKrakenMain", float("nan")) - started) * 1000,
+    "input_libs": sorted(name for name in ("pyautogui", "pynput") if name in sys.modules),
+}))
+"""
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "import_ms": (time.perf_counter() - started) * 1000,
+    "qt": "PySide6" in sys.modules,
+    "input_libs": sorted(name for name in ("pyautogui", "pynput") if name in sys.modules),
+}}))
+"""
+
+
+def _run_script(script: str):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        return None, elapsed, result.stderr.strip().splitlines()[-1:]
+    return json.loads(result.stdout.strip().splitlines()[-1]), elapsed, None
+
+
+def bench_startup(runs: int = 3):
+    """Import time of the GUI and headless entry points, and GUI time to first paint"""
+    for module in ("keykraken", "utils.cli"):
+        samples, report = [], None
+        for _ in range(runs):
+            report, elapsed, error = _run_script(IMPORT_SCRIPT.format(module=module))
+            if report is None:
+                print(f"import {module}: failed: {error}")
+                break
+            samples.append(report["import_ms"])
+        else:
+            print(f"import {module:<10} median {statistics.median(samples):7.1f} ms, "
+                  f"Qt loaded: {report['qt']}, input libraries loaded: {report['input_libs'] or 'none'}")
+
+    splash, window = [], []
+    for _ in range(runs):
+        report, elapsed, error = _run_script(FIRST_PAINT_SCRIPT)
+        if report is None:
+            print(f"first paint: failed (needs a display): {error}")
+            return
+        splash.append(report["splash_ms"])
+        window.append(report["window_ms"])
+    print(f"first paint: splash {statistics.median(splash):.1f} ms, "
+          f"main window {statistics.median(window):.1f} ms (median of {runs}, from interpreter start)")
+
+
+BENCHMARKS = {
+    "stop": bench_stop_latency,
+    "throughput": bench_throughput,
+    "timing": bench_timing_accuracy,
+    "paths": bench_path_compression,
+    "images": bench_image_match,
+    "capture": bench_capture,
+    "validate": bench_validation,
+    "startup": bench_startup,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KeyKraken benchmarks")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
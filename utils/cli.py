@@ -0,0 +1,295 @@
+"""
+Headless command line for KeyKraken
+    python keykraken.py run <scenario> --iterations N
+    python keykraken.py batch <scenario> <scenario> ... --gap SECONDS
+    python keykraken.py validate [scenario ...] --output report.json
+    python -m utils.cli run <scenario> --iterations N
+
+Only the execution core is imported (never PySide6), so it starts quickly and
+works on machines without a display server for Qt. Progress is written to
+stdout as JSON lines; the exit code is 0 on success, 1 if the run failed,
+2 for usage or load errors and 130 if interrupted.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+COMMANDS = ('run', 'batch', 'validate')
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+# How often progress lines are written while a scenario runs
+PROGRESS_INTERVAL = 0.1
+# Seconds between scenarios in a batch; matches utils.scenario_runner.DEFAULT_GAP,
+# which isn't imported here so --help stays fast
+DEFAULT_GAP = 1.0
+# Matches utils.screen_capture.DEFAULT_FRESHNESS, which needs NumPy to import
+DEFAULT_CAPTURE_FRESHNESS = 0.05
+
+
+class JsonLines:
+    """Writes one JSON object per line; safe to call from the engine thread"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def emit(self, event: str, **fields: Any):
+        record: Dict[str, Any] = {"event": event, "t": round(time.perf_counter() - self._started, 3)}
+        record.update(fields)
+        line = json.dumps(record)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def resolve_scenario(scenario: str, scenarios_dir: Path) -> Optional[Path]:
+    """A scenario file path, or the name of a scenario in scenarios_dir"""
+    from utils.scenario_store import scenario_files
+    path = Path(scenario)
+    if path.is_file():
+        return path
+    if scenarios_dir.is_dir():
+        return scenario_files(scenarios_dir).get(scenario)
+    return None
+
+
+def run_command(args: argparse.Namespace) -> int:
+    from utils.delay_tuning import DelayTuner, tuning_path
+    from utils.engine import MacroEngine, STOPPED_MESSAGE
+    from utils.input_backend import create_backend
+    from utils.scenario_store import load_scenario_file
+
+    out = JsonLines()
+    path = resolve_scenario(args.scenario, Path(args.scenarios_dir))
+    if path is None:
+        out.emit("error", message=f"Scenario not found: {args.scenario}")
+        return EXIT_USAGE
+    try:
+        data = load_scenario_file(path)
+        backend = create_backend(args.backend)
+        steps = data.get('steps', [])
+        tuner = DelayTuner(tuning_path(path), steps) if args.adaptive else None
+        engine = MacroEngine(steps, args.iterations, args.timing, backend, args.speed,
+                             on_iteration=lambda i, n: out.emit("iteration", iteration=i, iterations=n),
+                             base_dir=path.parent, tuner=tuner, capture_freshness=args.capture_freshness)
+    except Exception as e:
+        out.emit("error", message=str(e))
+        return EXIT_USAGE
+
+    steps = len(engine.steps)
+    out.emit("start", scenario=data.get('name', path.stem), path=str(path), steps=steps,
+             iterations=args.iterations, timing=args.timing, speed=args.speed)
+
+    result = {}
+    started = time.perf_counter()
+
+    def execute():
+        result["success"], result["message"] = engine.run()
+
+    def sample():
+        progress = engine.progress
+        if progress is not None:
+            return dict(iteration=progress[0], step=progress[1] + 1, steps=steps)
+        return None
+
+    interrupted = _drive(execute, engine.stop, sample, out, args.progress_interval)
+
+    success = result.get("success", False)
+    message = result.get("message", STOPPED_MESSAGE)
+    finished = {"success": success, "message": message,
+                "elapsed": round(time.perf_counter() - started, 3)}
+    if engine.timing_report is not None:
+        finished["timing"] = engine.timing_report
+    if engine.wait_report is not None:
+        finished["waits"] = engine.wait_report
+    if tuner is not None:
+        finished["tuning"] = tuner.report()
+        try:
+            tuner.save()
+        except OSError as e:
+            finished["tuning_error"] = f"Could not save learned delays: {e}"
+    out.emit("finished", **finished)
+    if success:
+        return EXIT_OK
+    return EXIT_INTERRUPTED if interrupted else EXIT_FAILED
+
+
+def _drive(target: Callable[[], None], stop: Callable[[], None],
+           sample: Callable[[], Optional[Dict[str, Any]]], out: JsonLines, interval: float) -> bool:
+    """
+    Run target on a worker thread, writing a progress line whenever sample()
+    changes, until it returns. Ctrl+C calls stop() and waits for the worker.
+    :return: True if interrupted.
+    """
+    worker = threading.Thread(target=target, name="keykraken-run")
+    worker.start()
+    interrupted = False
+    shown = None
+    while worker.is_alive():
+        try:
+            worker.join(interval)
+        except KeyboardInterrupt:
+            interrupted = True
+            stop()
+            continue
+        progress = sample()
+        if progress is not None and progress != shown and worker.is_alive():
+            shown = progress
+            out.emit("progress", **progress)
+    return interrupted
+
+
+def batch_command(args: argparse.Namespace) -> int:
+    from utils.input_backend import create_backend
+    from utils.scenario_runner import BatchRunner
+
+    out = JsonLines()
+    scenarios_dir = Path(args.scenarios_dir)
+    paths = []
+    for scenario in args.scenarios:
+        path = resolve_scenario(scenario, scenarios_dir)
+        if path is None:
+            out.emit("error", message=f"Scenario not found: {scenario}")
+            return EXIT_USAGE
+        paths.append(path)
+    try:
+        runner = BatchRunner(paths, args.iterations, args.timing, args.speed, args.gap,
+                             stop_on_failure=args.stop_on_failure, adaptive=args.adaptive,
+                             backend=create_backend(args.backend), capture_freshness=args.capture_freshness,
+                             on_event=lambda event, fields: out.emit(event, **fields))
+    except Exception as e:
+        out.emit("error", message=str(e))
+        return EXIT_USAGE
+
+    result = {}
+
+    def execute():
+        result["success"] = runner.run()
+
+    def sample():
+        progress = runner.progress
+        if progress is not None:
+            number, count, iteration, step = progress
+            return dict(scenario=number, scenarios=count, iteration=iteration,
+                        step=step + 1, steps=len(runner.current_steps))
+        return None
+
+    interrupted = _drive(execute, runner.stop, sample, out, args.progress_interval)
+    if result.get("success", False):
+        return EXIT_OK
+    return EXIT_INTERRUPTED if interrupted else EXIT_FAILED
+
+
+def _parse_screen(text: str):
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}") from None
+    return width, height
+
+
+def validate_command(args: argparse.Namespace) -> int:
+    from utils.validator import ValidationSettings, validate_directory
+
+    scenarios_dir = Path(args.scenarios_dir)
+    files = None
+    if args.scenarios:
+        files = []
+        for scenario in args.scenarios:
+            path = resolve_scenario(scenario, scenarios_dir)
+            if path is None:
+                JsonLines(sys.stderr).emit("error", message=f"Scenario not found: {scenario}")
+                return EXIT_USAGE
+            files.append(path)
+    elif not scenarios_dir.is_dir():
+        JsonLines(sys.stderr).emit("error", message=f"Not a directory: {scenarios_dir}")
+        return EXIT_USAGE
+
+    settings = ValidationSettings.detect()
+    if args.screen is not None:
+        settings.screen = args.screen
+    if args.no_key_check:
+        settings.key_names = None
+
+    report = validate_directory(scenarios_dir, settings, files, jobs=args.jobs, use_cache=not args.no_cache)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        summary = report["summary"]
+        print(f"{summary['scenarios']} scenario(s): {summary['ok']} ok, {summary['failed']} with errors "
+              f"({summary['cached']} from cache); report written to {args.output}")
+    else:
+        print(text)
+    return EXIT_OK if report["summary"]["failed"] == 0 else EXIT_FAILED
+
+
+def _add_execution_options(parser: argparse.ArgumentParser):
+    parser.add_argument("--timing", choices=("relative", "deadline"), default="relative",
+                        help="Sleep after each step, or hold steps to an absolute schedule")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (default: 1.0)")
+    parser.add_argument("--backend", default="pyautogui", help="Input backend: pyautogui, pynput or trace")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Shorten delays of steps with a verify condition, learning from each run")
+    parser.add_argument("--capture-freshness", type=float, default=DEFAULT_CAPTURE_FRESHNESS,
+                        metavar="SECONDS",
+                        help="Seconds a screen capture is reused by steps that read the screen "
+                             "(default: %(default)s)")
+    parser.add_argument("--scenarios-dir", default="scenarios", help="Where scenario names are looked up")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="Seconds between progress lines (default: %(default)s)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="keykraken", description="KeyKraken headless runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Execute a scenario without the GUI")
+    run.add_argument("scenario", help="Scenario name (in --scenarios-dir) or path to a scenario file")
+    run.add_argument("--iterations", "-n", type=int, default=1, help="Number of iterations (default: 1)")
+    _add_execution_options(run)
+    run.set_defaults(handler=run_command)
+
+    batch = commands.add_parser("batch", help="Execute several scenarios back-to-back")
+    batch.add_argument("scenarios", nargs="+", help="Scenario names or paths, in running order")
+    batch.add_argument("--iterations", "-n", type=int, default=None,
+                       help="Iterations per scenario (default: each scenario's 'loops', or 1)")
+    batch.add_argument("--gap", type=float, default=DEFAULT_GAP,
+                       help="Seconds between scenarios (default: %(default)s)")
+    batch.add_argument("--stop-on-failure", action="store_true", help="End the batch at the first failure")
+    _add_execution_options(batch)
+    batch.set_defaults(handler=batch_command)
+
+    validate = commands.add_parser("validate", help="Check scenarios without running them")
+    validate.add_argument("scenarios", nargs="*", help="Scenario names or paths (default: all in --scenarios-dir)")
+    validate.add_argument("--scenarios-dir", default="scenarios", help="Directory to validate")
+    validate.add_argument("--screen", type=_parse_screen, default=None,
+                          help="Screen size as WIDTHxHEIGHT (default: detected through pyautogui)")
+    validate.add_argument("--no-key-check", action="store_true", help="Don't check key names")
+    validate.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: one per CPU)")
+    validate.add_argument("--no-cache", action="store_true", help="Re-check every file")
+    validate.add_argument("--output", "-o", help="Write the JSON report to this file instead of stdout")
+    validate.set_defaults(handler=validate_command, iterations=None)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.iterations is not None and args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Adaptive delay tuning for KeyKraken
+Steps with a 'verify' condition don't need their full configured delay once the
+application has shown it reacts faster. A DelayTuner learns, across iterations
+and runs, how soon after each such step its condition holds, and shrinks the
+step's delay toward that bound plus a safety margin. Learned delays are stored
+beside the scenario in a <name>.kkt JSON file; the scenario itself is never
+changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from utils.step_plan import PlanOp
+
+TUNING_EXTENSION = ".kkt"
+TUNING_VERSION = 1
+# A delay is never tuned below the observed bound * (1 + MARGIN_RATIO) + MARGIN_SECONDS
+MARGIN_RATIO = 0.25
+MARGIN_SECONDS = 0.05
+# Fraction of the gap to the target closed per observation when shrinking;
+# growing to cover a slower response happens at once
+SHRINK_RATE = 0.5
+
+
+def tuning_path(scenario_path: Union[str, Path]) -> Path:
+    """Where learned delays for a scenario file are kept"""
+    path = Path(scenario_path)
+    # Not with_suffix: scenario names may contain dots
+    return path.with_name(path.stem + TUNING_EXTENSION)
+
+
+def step_key(step: Dict[str, Any]) -> str:
+    """Identifies a step's content apart from its delay, so edits discard what was learned"""
+    content = {key: value for key, value in step.items() if key not in ('delay', 'name')}
+    payload = json.dumps(content, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class _Tuned:
+    __slots__ = ('key', 'delay', 'runs', 'slowest')
+
+    def __init__(self, key: str, delay: float, runs: int = 0, slowest: float = 0.0):
+        self.key = key
+        self.delay = delay
+        self.runs = runs
+        self.slowest = slowest
+
+
+class DelayTuner:
+    """
+    Learned delays for one scenario's verified steps, keyed by step index.
+    Not thread-safe: use it from the thread that runs the scenario.
+    :param path: The tuning file; loaded here if it exists.
+    :param steps: The scenario's steps, to tell whether a stored value still
+        belongs to the step at its index.
+    """
+
+    def __init__(self, path: Union[str, Path], steps: Sequence[Dict[str, Any]]):
+        self.path = Path(path)
+        self.steps = steps
+        self._tuned: Dict[int, _Tuned] = {}
+        self._stored: Dict[str, Dict[str, Any]] = {}
+        self._configured: Dict[int, float] = {}
+        self.changed = False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get('version') == TUNING_VERSION:
+                self._stored = data.get('steps', {})
+        except (OSError, ValueError):
+            pass
+
+    def _entry(self, op: PlanOp) -> _Tuned:
+        tuned = self._tuned.get(op.index)
+        if tuned is None:
+            key = step_key(self.steps[op.index])
+            stored = self._stored.get(str(op.index))
+            if isinstance(stored, dict) and stored.get('key') == key:
+                tuned = _Tuned(key, min(float(stored.get('delay', op.delay)), op.delay),
+                               int(stored.get('runs', 0)), float(stored.get('slowest', 0.0)))
+            else:
+                tuned = _Tuned(key, op.delay)
+            self._tuned[op.index] = tuned
+            self._configured[op.index] = op.delay
+        return tuned
+
+    def delay(self, op: PlanOp) -> float:
+        """The delay to use after op, never more than its configured delay"""
+        return self._entry(op).delay
+
+    def observe(self, op: PlanOp, seconds: Optional[float]):
+        """
+        Record how long after op its condition took to hold.
+        :param seconds: None if it didn't hold within the configured delay,
+            which resets the step to its configured delay.
+        """
+        tuned = self._entry(op)
+        tuned.runs += 1
+        if seconds is None:
+            tuned.delay = op.delay
+        else:
+            tuned.slowest = max(tuned.slowest, seconds)
+            target = min(seconds * (1 + MARGIN_RATIO) + MARGIN_SECONDS, op.delay)
+            if target >= tuned.delay:
+                tuned.delay = target
+            else:
+                tuned.delay -= (tuned.delay - target) * SHRINK_RATE
+        self.changed = True
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """Configured and learned delay per tuned step, and the seconds saved per iteration"""
+        if not self._tuned:
+            return None
+        steps: List[Dict[str, Any]] = []
+        for index in sorted(self._tuned):
+            tuned = self._tuned[index]
+            steps.append({
+                "index": index,
+                "configured": self._configured[index],
+                "learned": round(tuned.delay, 4),
+                "runs": tuned.runs,
+                "slowest_ms": tuned.slowest * 1000,
+            })
+        return {
+            "steps": steps,
+            "saved_per_iteration_s": sum(step["configured"] - step["learned"] for step in steps),
+        }
+
+    def save(self):
+        """
+        Write learned delays if anything changed.
+        :raises OSError: If the file can't be written; the learning is lost, but
+            the scenario is unaffected, so callers report it and carry on.
+        """
+        if not self.changed:
+            return
+        stored = dict(self._stored)
+        for index, tuned in self._tuned.items():
+            stored[str(index)] = {"key": tuned.key, "delay": round(tuned.delay, 4),
+                                  "runs": tuned.runs, "slowest": round(tuned.slowest, 4)}
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({"version": TUNING_VERSION, "steps": stored}, f, indent=1)
+            os.replace(temp_path, self.path)
+            self.changed = False
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
@@ -0,0 +1,412 @@
+"""
+Execution engine for KeyKraken
+Replays a scenario's steps through an InputBackend. Has no Qt dependency, so it
+backs both the GUI's MacroExecutor thread and the headless command line runner.
+"""
+
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from utils.delay_tuning import DelayTuner
+from utils.input_backend import InputBackend, create_backend
+from utils.scheduler import DeadlineScheduler
+from utils.step_plan import compile_steps, PlanOp, Region, StepValidationError
+
+# Called with (iteration, total iterations) as each iteration starts
+IterationCallback = Callable[[int, int], None]
+
+STOPPED_MESSAGE = "Execution stopped by user"
+
+
+class WaitLog:
+    """Seconds each condition-waiting step spent waiting, across iterations"""
+
+    def __init__(self):
+        self._steps: Dict[int, List[Any]] = {}
+
+    def add(self, op: PlanOp, seconds: float):
+        entry = self._steps.get(op.index)
+        if entry is None:
+            self._steps[op.index] = [op, 1, seconds, seconds]
+            return
+        entry[1] += 1
+        entry[2] += seconds
+        entry[3] = max(entry[3], seconds)
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """Per-step runs, mean and max wait in milliseconds, and the total in seconds"""
+        if not self._steps:
+            return None
+        steps = []
+        for index in sorted(self._steps):
+            op, runs, total, longest = self._steps[index]
+            steps.append({
+                "index": index,
+                "name": op.name,
+                "kind": op.kind,
+                "runs": runs,
+                "mean_ms": total / runs * 1000,
+                "max_ms": longest * 1000,
+            })
+        return {
+            "steps": steps,
+            "waits": sum(step["runs"] for step in steps),
+            "total_s": sum(entry[2] for entry in self._steps.values()),
+        }
+
+
+class MacroEngine:
+    """
+    Runs steps for a number of iterations.
+    Per-step progress is published to self.progress as (iteration, step index)
+    rather than reported through a callback, so observers can sample it at their
+    own rate. stop() may be called from any thread.
+    :param base_dir: Directory relative image step paths are resolved against
+        (the scenario's folder); the working directory is tried next.
+    :param tuner: Enables adaptive delays: steps with a verify condition wait
+        for it instead of sleeping their full delay, and the tuner learns how
+        short each delay can safely be. Saving it is up to the caller.
+    :param start_delay: Seconds to wait before the first step (e.g. to let the
+        user position windows), interruptible by stop().
+    :param capture_freshness: Seconds a screen capture is shared between steps
+        that read the screen; None uses ScreenCapture's default.
+    """
+    PATH_SLICE = 0.05
+    # Seconds between screen searches while an image step waits for its template
+    IMAGE_POLL = 0.1
+    MIN_SPEED = 0.25
+    MAX_SPEED = 10.0
+
+    def __init__(self, steps: Sequence[Dict[str, Any]], iterations: int = 1, timing: str = 'relative',
+                 backend: Optional[InputBackend] = None, speed: float = 1.0,
+                 on_iteration: Optional[IterationCallback] = None,
+                 base_dir: Optional[Union[str, Path]] = None, tuner: Optional[DelayTuner] = None,
+                 start_delay: float = 0.0, capture_freshness: Optional[float] = None):
+        if not self.MIN_SPEED <= speed <= self.MAX_SPEED:
+            raise ValueError(f"Replay speed must be between {self.MIN_SPEED}x and {self.MAX_SPEED}x")
+        self.steps = steps
+        self.iterations = iterations
+        self.timing = timing  # 'relative' (sleep after each step) or 'deadline'
+        self.speed = speed  # Replay-speed multiplier applied to every delay
+        self.backend = backend
+        self.on_iteration = on_iteration
+        self.base_dir = Path(base_dir) if base_dir is not None else None
+        self.tuner = tuner
+        self.start_delay = start_delay
+        self.capture_freshness = capture_freshness
+        self.timing_report = None
+        self.progress: Optional[Tuple[int, int]] = None
+        self._stop_event = threading.Event()
+        # ScreenCapture shared by every step that reads the screen
+        self.capture = None
+        self._locator = None
+        self._waits = WaitLog()
+
+    @property
+    def should_stop(self) -> bool:
+        return self._stop_event.is_set()
+
+    @property
+    def wait_report(self) -> Optional[Dict[str, Any]]:
+        """Time spent in condition waits so far, or None if no step waited"""
+        return self._waits.report()
+
+    def _handlers(self) -> Dict[str, Any]:
+        backend = self.backend
+        return {
+            'click': backend.click,
+            'keypress': backend.press,
+            'type': self._do_type,
+            'scroll': backend.scroll,
+            'move': backend.move_to,
+            'path': self._do_path,
+            'image': self._do_image,
+            'wait_pixel': self._do_wait_pixel,
+            'wait_image': self._do_wait_image,
+            'wait_region_stable': self._do_wait_region_stable,
+        }
+
+    def _do_type(self, text: str, interval: float):
+        # One keystroke per call with event waits in between, so stop lands mid-string.
+        # The interval separates characters; the step's delay follows the last one
+        type_char = self.backend.type_char
+        interval /= self.speed
+        for i, char in enumerate(text):
+            if i and self._stop_event.wait(interval):
+                return
+            type_char(char)
+
+    def _do_path(self, points: Tuple[Tuple[int, int, float], ...]):
+        # One backend move at the end of each simplified segment; segments longer
+        # than PATH_SLICE are cut into interpolated slices so the pointer keeps pace
+        move_to = self.backend.move_to
+        wait = self._stop_event.wait
+        slice_seconds = self.PATH_SLICE
+        started = time.perf_counter()
+        prev_x, prev_y, prev_offset = points[0][0], points[0][1], 0.0
+        move_to(prev_x, prev_y)
+        for x, y, offset in points[1:]:
+            offset /= self.speed
+            span = offset - prev_offset
+            slices = max(1, math.ceil(span / slice_seconds)) if (x, y) != (prev_x, prev_y) else 1
+            for i in range(1, slices + 1):
+                fraction = i / slices
+                remaining = started + prev_offset + span * fraction - time.perf_counter()
+                if remaining > 0 and wait(remaining):
+                    return
+                move_to(round(prev_x + (x - prev_x) * fraction), round(prev_y + (y - prev_y) * fraction))
+            prev_x, prev_y, prev_offset = x, y, offset
+
+    def _screen(self):
+        # Created on first use, so scenarios that never look at the screen don't import NumPy
+        if self.capture is None:
+            try:
+                from utils.screen_capture import ScreenCapture
+            except ImportError as e:
+                raise RuntimeError(f"Steps that read the screen need NumPy ({e.name} is not installed)") from None
+            if self.capture_freshness is None:
+                self.capture = ScreenCapture(self.backend.grab)
+            else:
+                self.capture = ScreenCapture(self.backend.grab, self.capture_freshness)
+        return self.capture
+
+    def _image_locator(self):
+        if self._locator is None:
+            capture = self._screen()
+            try:
+                from utils.image_match import ImageLocator
+            except ImportError as e:
+                raise RuntimeError(f"Image steps need NumPy and Pillow ({e.name} is not installed)") from None
+            self._locator = ImageLocator(capture.capture)
+        return self._locator
+
+    def _image_path(self, value: str) -> Path:
+        path = Path(value)
+        if not path.is_absolute() and self.base_dir is not None and (self.base_dir / path).is_file():
+            return self.base_dir / path
+        if not path.is_file():
+            raise FileNotFoundError(f"Image file not found: {value}")
+        return path
+
+    def _wait_until(self, condition: Callable[[], Any], timeout: float, poll: float, what: str) -> float:
+        """
+        Check condition every poll seconds until it returns something truthy.
+        Timeout and poll are real time, not scaled by the replay speed. The
+        first check may use a frame shared with other lookups; later checks
+        always capture anew.
+        :return: Seconds waited (also when interrupted by stop()).
+        :raises RuntimeError: If timeout passes first.
+        """
+        started = time.perf_counter()
+        deadline = started + timeout
+        while not condition():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise RuntimeError(f"Timed out after {timeout:g} s waiting for {what}")
+            if self._stop_event.wait(min(poll, remaining)):
+                break
+            self.capture.invalidate()
+        return time.perf_counter() - started
+
+    def _do_image(self, value: str, confidence: float, button: str, timeout: float) -> float:
+        locator = self._image_locator()
+        path = self._image_path(value)
+        hit = None
+
+        def found():
+            nonlocal hit
+            hit = locator.find(path, confidence)
+            return hit
+
+        waited = self._wait_until(found, timeout, self.IMAGE_POLL, f"image {value}")
+        if hit is not None:
+            self.backend.click(hit[0], hit[1], button)
+        return waited
+
+    def _image_condition(self, value: str, confidence: float) -> Callable[[], Any]:
+        locator = self._image_locator()
+        path = self._image_path(value)
+        return lambda: locator.find(path, confidence)
+
+    def _pixel_condition(self, x: int, y: int, color: Tuple[int, int, int], tolerance: int) -> Callable[[], bool]:
+        capture = self._screen()
+        return lambda: all(abs(a - b) <= tolerance for a, b in zip(capture.pixel(x, y), color))
+
+    def _region_stable_condition(self, region: Region, stable: float) -> Callable[[], bool]:
+        # Compares tile hashes between checks; the region counts as stable once
+        # none of them changed for the given number of seconds
+        capture = self._screen()
+        last_hashes = None
+        changed_at = 0.0
+
+        def settled():
+            nonlocal last_hashes, changed_at
+            hashes = capture.hashes(region).tobytes()
+            now = time.perf_counter()
+            if hashes != last_hashes:
+                last_hashes, changed_at = hashes, now
+                return False
+            return now - changed_at >= stable
+
+        return settled
+
+    def _condition(self, kind: str, args: Tuple) -> Callable[[], Any]:
+        """A fresh check for a verify condition or wait step ('pixel', 'image' or 'region_stable')"""
+        if kind == 'pixel':
+            return self._pixel_condition(*args)
+        if kind == 'image':
+            return self._image_condition(*args)
+        return self._region_stable_condition(*args)
+
+    def _do_wait_image(self, value: str, confidence: float, timeout: float, poll: float) -> float:
+        return self._wait_until(self._image_condition(value, confidence), timeout, poll, f"image {value}")
+
+    def _do_wait_pixel(self, x: int, y: int, color: Tuple[int, int, int], tolerance: int,
+                       timeout: float, poll: float) -> float:
+        return self._wait_until(self._pixel_condition(x, y, color, tolerance), timeout, poll,
+                                f"({x}, {y}) to turn #{color[0]:02x}{color[1]:02x}{color[2]:02x}")
+
+    def _do_wait_region_stable(self, region: Region, stable: float,
+                               timeout: float, poll: float) -> float:
+        left, top, width, height = region
+        return self._wait_until(self._region_stable_condition(region, stable), timeout, poll,
+                                f"{width}x{height} region at ({left}, {top}) to settle")
+
+    def _settle(self, op: PlanOp):
+        """
+        Adaptive replacement for op's fixed delay: watch its verify condition
+        until it holds (at most the configured delay), report that time to the
+        tuner, and continue once the learned delay has passed.
+        """
+        kind, args, poll = op.verify
+        condition = self._condition(kind, args)
+        learned = self.tuner.delay(op)
+        wait = self._stop_event.wait
+        started = time.perf_counter()
+        held = None
+        while True:
+            if condition():
+                held = time.perf_counter() - started
+                break
+            remaining = started + op.delay - time.perf_counter()
+            if remaining <= 0:
+                break
+            if wait(min(poll, remaining)):
+                return
+            self.capture.invalidate()
+        self.tuner.observe(op, held)
+        if held is not None and held > learned:
+            # Slower than learned: the tuner has grown the delay to cover it, margin included
+            learned = self.tuner.delay(op)
+        remaining = started + learned - time.perf_counter()
+        if remaining > 0:
+            wait(remaining)
+
+    def compile(self) -> List[PlanOp]:
+        """
+        Validate and resolve every step, creating the backend if needed.
+        Raises StepValidationError for a broken scenario.
+        """
+        if self.backend is None:
+            self.backend = create_backend()
+        plan = compile_steps(self.steps, self._handlers())
+        if self.speed != 1.0:
+            for op in plan:
+                op.delay /= self.speed
+                op.duration /= self.speed
+        return plan
+
+    def run(self, plan: Optional[List[PlanOp]] = None) -> Tuple[bool, str]:
+        """
+        Execute the scenario.
+        :param plan: A plan from compile(); compiled here if not given.
+        :return: (success, message)
+        """
+        try:
+            if plan is None:
+                try:
+                    plan = self.compile()
+                except StepValidationError as e:
+                    return False, f"Invalid scenario: {str(e)}"
+
+            if self.start_delay > 0 and self._stop_event.wait(self.start_delay):
+                return False, STOPPED_MESSAGE
+
+            self.backend.begin()
+            try:
+                return self._run_plan(plan, self._stop_event)
+            finally:
+                self.backend.end()
+
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+
+    def _run_plan(self, plan: List[PlanOp], stop: threading.Event) -> Tuple[bool, str]:
+        waits = self._waits = WaitLog()
+        tuner = self.tuner
+
+        scheduler = None
+        if self.timing == 'deadline':
+            scheduler = DeadlineScheduler(len(plan), stop_event=stop)
+            scheduler.start()
+
+        for iteration in range(self.iterations):
+            if stop.is_set():
+                return False, STOPPED_MESSAGE
+
+            if self.on_iteration is not None:
+                self.on_iteration(iteration + 1, self.iterations)
+
+            for op in plan:
+                if scheduler is not None:
+                    scheduler.wait(op.index)
+                if stop.is_set():
+                    return False, STOPPED_MESSAGE
+
+                self.progress = (iteration + 1, op.index)
+                waited = op.handler(*op.args)
+                if self.capture is not None:
+                    # Whatever the step did may have changed the screen
+                    self.capture.invalidate()
+                if waited is not None:
+                    # Condition steps return how long they waited
+                    waits.add(op, waited)
+                    if scheduler is not None:
+                        # The schedule resumes from when the condition held
+                        scheduler.rebase()
+
+                if tuner is not None and op.verify is not None:
+                    self._settle(op)
+                    if scheduler is not None:
+                        scheduler.rebase()
+                elif scheduler is None:
+                    # The delay is the whole gap: recorded delays already include reaction time
+                    stop.wait(op.delay)
+                else:
+                    # The next step is due once this one's own action and its delay have passed
+                    scheduler.advance(op.duration + op.delay)
+
+        if scheduler is not None:
+            scheduler.finish()
+        if stop.is_set():
+            return False, STOPPED_MESSAGE
+
+        message = f"Execution completed successfully ({self.iterations} iteration(s))"
+        if scheduler is not None:
+            self.timing_report = scheduler.report()
+            message += (f"\nStep lateness: mean {self.timing_report['mean_ms']:.2f} ms, "
+                        f"max {self.timing_report['max_ms']:.2f} ms")
+        wait_report = waits.report()
+        if wait_report is not None:
+            message += f"\nCondition waits: {wait_report['waits']} totalling {wait_report['total_s']:.2f} s"
+        tuning_report = tuner.report() if tuner is not None else None
+        if tuning_report is not None:
+            message += (f"\nAdaptive delays: {len(tuning_report['steps'])} step(s) tuned, "
+                        f"{tuning_report['saved_per_iteration_s']:.2f} s saved per iteration")
+        return True, message
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,310 @@
+"""
+Template matching for KeyKraken
+Finds a template image on screen by normalized cross-correlation (NCC) on
+grayscale pixels. Correlation is computed with FFTs and window statistics with
+integral images. The search starts on a coarse pyramid level and refines
+candidates level by level. When a template was found before, only a region
+around the last hit is captured and searched first.
+
+Templates are decoded and prepared once and kept in a memory-capped cache that
+is shared by every locator in the process.
+
+Needs NumPy, and Pillow to decode template files; import this module only when
+an image step is actually used.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.step_plan import DEFAULT_CONFIDENCE, Region
+
+# Coarsest pyramid level keeps the template at least this many pixels on each side
+MIN_TEMPLATE_SIZE = 12
+MAX_LEVELS = 4
+# Coarse levels blur fine detail, so candidates are kept at a lower score
+COARSE_SLACK = 0.2
+COARSE_CANDIDATES = 3
+# Pixels searched either side of a candidate when refining on the next finer level
+REFINE_RADIUS = 2
+# Pixels captured around the last hit before falling back to a full-screen search
+ROI_MARGIN = 64
+DEFAULT_TEMPLATE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def to_gray(image: Any) -> np.ndarray:
+    """Float32 grayscale array from a PIL image or an HxW / HxWxC array"""
+    if hasattr(image, 'convert'):
+        return np.asarray(image.convert('L'), dtype=np.float32)
+    array = np.asarray(image)
+    if array.ndim == 3:
+        # ITU-R 601 luma, as PIL's 'L' conversion uses
+        array = array[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return array.astype(np.float32, copy=False)
+
+
+def load_image(path: Union[str, Path]) -> np.ndarray:
+    from PIL import Image
+    with Image.open(path) as image:
+        return to_gray(image)
+
+
+def downsample(gray: np.ndarray) -> np.ndarray:
+    """Half-size image, each pixel the mean of a 2x2 block"""
+    height, width = gray.shape[0] // 2 * 2, gray.shape[1] // 2 * 2
+    g = gray[:height, :width]
+    return (g[0::2, 0::2] + g[1::2, 0::2] + g[0::2, 1::2] + g[1::2, 1::2]) * 0.25
+
+
+class Template:
+    """
+    A needle prepared for matching: its pyramid, and per level the zero-mean
+    pixels and their norm that the correlation needs, plus the level's mean and
+    standard deviation.
+    """
+
+    def __init__(self, gray: np.ndarray, max_levels: int = MAX_LEVELS):
+        self.height, self.width = gray.shape
+        self.levels: List[Tuple[np.ndarray, float]] = []
+        self.stats: List[Tuple[float, float]] = []
+        level = gray
+        while True:
+            mean = float(level.mean())
+            zero_mean = level - mean
+            norm = float(np.sqrt((zero_mean * zero_mean).sum()))
+            self.levels.append((zero_mean, norm))
+            self.stats.append((mean, norm / float(np.sqrt(level.size))))
+            if len(self.levels) >= max_levels or min(level.shape) // 2 < MIN_TEMPLATE_SIZE:
+                break
+            level = downsample(level)
+
+    @property
+    def gray(self) -> np.ndarray:
+        """The full-size grayscale template"""
+        return self.levels[0][0] + self.stats[0][0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(zero_mean.nbytes for zero_mean, _ in self.levels)
+
+
+class TemplateCache:
+    """
+    Thread-safe LRU cache of prepared Templates, capped by the memory their
+    arrays take. An entry is only served while the file's (mtime, size) still
+    match, so an edited template is picked up on its next lookup.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_TEMPLATE_CACHE_BYTES, max_levels: int = MAX_LEVELS):
+        self.max_bytes = max_bytes
+        self.max_levels = max_levels
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Path, Tuple[Tuple[int, int], Template]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> Template:
+        """Prepared template for an image file; raises OSError if it can't be read"""
+        path = Path(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        template = Template(load_image(path), self.max_levels)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.total_bytes -= old[1].nbytes
+            if template.nbytes <= self.max_bytes:
+                self._entries[path] = (stamp, template)
+                self.total_bytes += template.nbytes
+                while self.total_bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.total_bytes -= evicted.nbytes
+        return template
+
+    def discard(self, path: Union[str, Path]):
+        with self._lock:
+            entry = self._entries.pop(Path(path), None)
+            if entry is not None:
+                self.total_bytes -= entry[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+# Shared by every ImageLocator that isn't given its own loader, so templates
+# stay decoded across runs, iterations and batch scenarios
+shared_cache = TemplateCache()
+
+
+def ncc_map(haystack: np.ndarray, needle: np.ndarray, needle_norm: float) -> np.ndarray:
+    """
+    NCC score of the zero-mean needle at every position where it fits entirely
+    inside haystack; shape (H - h + 1, W - w + 1), values in [-1, 1].
+    Flat windows (and a flat needle) score 0.
+    """
+    H, W = haystack.shape
+    h, w = needle.shape
+    if h > H or w > W:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    # Correlation as convolution with the flipped needle; circular wrap-around
+    # only touches positions outside the valid range that is sliced out
+    shape = (H, W)
+    spectrum = np.fft.rfft2(haystack, shape) * np.fft.rfft2(needle[::-1, ::-1], shape)
+    numerator = np.fft.irfft2(spectrum, shape)[h - 1:, w - 1:]
+
+    # Window sums from integral images (float64: sums of squares lose precision)
+    padded = np.zeros((H + 1, W + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(haystack, axis=0, dtype=np.float64), axis=1, out=padded[1:, 1:])
+    sums = padded[h:, w:] - padded[:-h, w:] - padded[h:, :-w] + padded[:-h, :-w]
+    padded[1:, 1:] = np.cumsum(np.cumsum(np.square(haystack, dtype=np.float64), axis=0), axis=1)
+    squares = padded[h:, w:] - padded[:-h, w:] - padded[h:, :-w] + padded[:-h, :-w]
+
+    variance = np.maximum(squares - sums * sums / (h * w), 0.0)
+    denominator = np.sqrt(variance) * needle_norm
+    scores = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=scores, where=denominator > 1e-6)
+    return scores.astype(np.float32, copy=False)
+
+
+def _peaks(scores: np.ndarray, count: int, floor: float, spread: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Up to count best positions scoring at least floor, at least spread apart"""
+    scores = scores.copy()
+    found = []
+    spread_y, spread_x = spread
+    for _ in range(count):
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        if scores[y, x] < floor:
+            break
+        found.append((int(x), int(y)))
+        scores[max(0, y - spread_y):y + spread_y + 1, max(0, x - spread_x):x + spread_x + 1] = -1
+    return found
+
+
+def locate(haystack: np.ndarray, template: Template,
+           confidence: float = DEFAULT_CONFIDENCE) -> Optional[Tuple[int, int, float]]:
+    """
+    Best match of template in haystack, coarse to fine.
+    :return: (left, top, score) of the match in haystack pixels, or None if
+        nothing scores at least confidence.
+    """
+    if template.height > haystack.shape[0] or template.width > haystack.shape[1]:
+        return None
+
+    # Only use levels where the haystack still holds the template
+    levels = [haystack]
+    while len(levels) < len(template.levels):
+        smaller = downsample(levels[-1])
+        needle = template.levels[len(levels)][0]
+        if needle.shape[0] > smaller.shape[0] or needle.shape[1] > smaller.shape[1]:
+            break
+        levels.append(smaller)
+    top = len(levels) - 1
+
+    needle, norm = template.levels[top]
+    scores = ncc_map(levels[top], needle, norm)
+    floor = confidence - COARSE_SLACK if top else confidence
+    candidates = _peaks(scores, COARSE_CANDIDATES if top else 1, floor,
+                        (needle.shape[0] // 2, needle.shape[1] // 2))
+
+    best = None
+    for x, y in candidates:
+        score = float(scores[y, x])
+        for level in range(top - 1, -1, -1):
+            image = levels[level]
+            needle, norm = template.levels[level]
+            h, w = needle.shape
+            x, y = x * 2, y * 2
+            # Search a small window around the upscaled position
+            left = max(0, x - REFINE_RADIUS)
+            upper = max(0, y - REFINE_RADIUS)
+            right = min(image.shape[1], x + REFINE_RADIUS + w)
+            lower = min(image.shape[0], y + REFINE_RADIUS + h)
+            window = ncc_map(image[upper:lower, left:right], needle, norm)
+            if window.size == 0:
+                score = -1.0
+                break
+            dy, dx = np.unravel_index(int(np.argmax(window)), window.shape)
+            x, y, score = left + int(dx), upper + int(dy), float(window[dy, dx])
+        if score >= confidence and (best is None or score > best[2]):
+            best = (x, y, score)
+    return best
+
+
+class ImageLocator:
+    """
+    Finds templates on screen, searching around each template's last hit first.
+    :param grab: Captures a screen region (or the whole screen for None) and
+        returns a PIL image or array, e.g. InputBackend.grab.
+    :param load: Returns a Template for an image path; default the shared
+        TemplateCache.
+    """
+
+    def __init__(self, grab: Callable[[Optional[Region]], Any],
+                 load: Optional[Callable[[Path], Template]] = None, roi_margin: int = ROI_MARGIN):
+        self.grab = grab
+        self.load = load or shared_cache.get
+        self.roi_margin = roi_margin
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.last_hits: Dict[Path, Region] = {}
+        self.last_search_ms = 0.0
+
+    def _search(self, template: Template, confidence: float,
+                region: Optional[Region]) -> Optional[Tuple[int, int, float]]:
+        haystack = to_gray(self.grab(region))
+        if region is None:
+            self.screen_size = (haystack.shape[1], haystack.shape[0])
+        hit = locate(haystack, template, confidence)
+        if hit is None:
+            return None
+        left, top = (region[0], region[1]) if region else (0, 0)
+        return hit[0] + left, hit[1] + top, hit[2]
+
+    def _roi(self, path: Path, template: Template) -> Optional[Region]:
+        last = self.last_hits.get(path)
+        if last is None or self.screen_size is None:
+            return None
+        margin = self.roi_margin
+        left, top = max(0, last[0] - margin), max(0, last[1] - margin)
+        right = min(self.screen_size[0], last[0] + template.width + margin)
+        bottom = min(self.screen_size[1], last[1] + template.height + margin)
+        if right - left < template.width or bottom - top < template.height:
+            return None
+        return left, top, right - left, bottom - top
+
+    def find(self, path: Union[str, Path], confidence: float = DEFAULT_CONFIDENCE) -> Optional[Tuple[int, int, float]]:
+        """
+        Look for the template once.
+        :return: (center x, center y, score) in screen pixels, or None.
+        """
+        path = Path(path)
+        template = self.load(path)
+        started = time.perf_counter()
+        hit = None
+        region = self._roi(path, template)
+        if region is not None:
+            hit = self._search(template, confidence, region)
+        if hit is None:
+            hit = self._search(template, confidence, None)
+        self.last_search_ms = (time.perf_counter() - started) * 1000
+        if hit is None:
+            return None
+        x, y, score = hit
+        self.last_hits[path] = (x, y, template.width, template.height)
+        return x + template.width // 2, y + template.height // 2, score
@@ -0,0 +1,359 @@
+"""
+Input backends for KeyKraken
+Everything that emits or captures mouse/keyboard input goes through an InputBackend,
+so the executor and recorder can run against pyautogui, raw pynput controllers or an
+in-memory trace (headless benchmarking and CI).
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional, Tuple
+
+from utils.step_plan import MOUSE_BUTTONS
+
+# Capture callbacks receive the event's perf_counter_ns timestamp as their last argument
+ClickCallback = Callable[[int, int, str, int], None]
+PressCallback = Callable[[str, int], None]
+MoveCallback = Callable[[int, int, int], None]
+
+# pyautogui key names that pynput spells differently
+PYNPUT_KEY_ALIASES = {
+    'escape': 'esc',
+    'return': 'enter',
+    'del': 'delete',
+    'pageup': 'page_up',
+    'pgup': 'page_up',
+    'pagedown': 'page_down',
+    'pgdn': 'page_down',
+    'capslock': 'caps_lock',
+    'numlock': 'num_lock',
+    'scrolllock': 'scroll_lock',
+    'printscreen': 'print_screen',
+    'prtsc': 'print_screen',
+    'win': 'cmd',
+    'winleft': 'cmd_l',
+    'winright': 'cmd_r',
+    'command': 'cmd',
+    'option': 'alt',
+    'ctrlleft': 'ctrl_l',
+    'ctrlright': 'ctrl_r',
+    'shiftleft': 'shift_l',
+    'shiftright': 'shift_r',
+    'altleft': 'alt_l',
+    'altright': 'alt_r',
+    'apps': 'menu',
+    'volumemute': 'media_volume_mute',
+    'volumedown': 'media_volume_down',
+    'volumeup': 'media_volume_up',
+    'playpause': 'media_play_pause',
+    'nexttrack': 'media_next',
+    'prevtrack': 'media_previous',
+}
+
+# pynput names of captured keys that pyautogui spells differently; names both
+# libraries share (enter, esc, delete, alt, ...) are left as they are
+PYAUTOGUI_KEY_NAMES = {
+    'page_up': 'pageup',
+    'page_down': 'pagedown',
+    'caps_lock': 'capslock',
+    'num_lock': 'numlock',
+    'scroll_lock': 'scrolllock',
+    'print_screen': 'printscreen',
+    'cmd': 'win',
+    'cmd_l': 'winleft',
+    'cmd_r': 'winright',
+    'ctrl_l': 'ctrlleft',
+    'ctrl_r': 'ctrlright',
+    'shift_l': 'shiftleft',
+    'shift_r': 'shiftright',
+    'alt_l': 'altleft',
+    'alt_r': 'altright',
+    'alt_gr': 'altright',
+    'menu': 'apps',
+    'media_volume_mute': 'volumemute',
+    'media_volume_down': 'volumedown',
+    'media_volume_up': 'volumeup',
+    'media_play_pause': 'playpause',
+    'media_next': 'nexttrack',
+    'media_previous': 'prevtrack',
+}
+
+
+class InputListener:
+    """Handle for an active capture session started by InputBackend.listen"""
+
+    def stop(self):
+        pass
+
+    def join(self, timeout: Optional[float] = None):
+        pass
+
+
+class InputBackend(ABC):
+    """
+    Interface for emitting and capturing input events.
+    Coordinates are absolute screen pixels; buttons are 'left', 'right' or 'middle';
+    key names use pyautogui's spelling, for emitted and captured keys alike.
+    """
+    name = 'base'
+
+    def begin(self):
+        """Called once before a run starts"""
+
+    def end(self):
+        """Called once after a run ends, even if it failed"""
+
+    @abstractmethod
+    def click(self, x: int, y: int, button: str = 'left'):
+        pass
+
+    @abstractmethod
+    def press(self, key: str):
+        pass
+
+    @abstractmethod
+    def type_char(self, char: str):
+        pass
+
+    @abstractmethod
+    def scroll(self, amount: int):
+        pass
+
+    @abstractmethod
+    def move_to(self, x: int, y: int):
+        pass
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Any:
+        """
+        Capture the screen, or only region as (left, top, width, height).
+        :return: A PIL image (or an array for in-memory backends).
+        """
+        import pyscreeze
+        return pyscreeze.screenshot(region=region)
+
+    @abstractmethod
+    def listen(self, on_click: ClickCallback, on_press: PressCallback,
+               on_move: Optional[MoveCallback] = None) -> InputListener:
+        """
+        Start capturing clicks and key presses (and pointer moves, if on_move is
+        given) until the returned listener is stopped. Clicks of buttons other
+        than MOUSE_BUTTONS (side buttons) are not reported.
+        """
+
+
+class _PynputListener(InputListener):
+    def __init__(self, on_click: ClickCallback, on_press: PressCallback,
+                 on_move: Optional[MoveCallback] = None):
+        from pynput import mouse, keyboard
+
+        # Timestamp first thing in the listener thread, before any other work
+        def handle_click(x, y, button, pressed):
+            t_ns = time.perf_counter_ns()
+            # Side buttons (x1, x2, ...) have no pyautogui equivalent to replay them with
+            if pressed and button.name in MOUSE_BUTTONS:
+                on_click(int(x), int(y), button.name, t_ns)
+
+        def handle_press(key):
+            t_ns = time.perf_counter_ns()
+            key_name = getattr(key, 'char', None)
+            if not key_name:
+                key_name = str(key).replace('Key.', '')
+                key_name = PYAUTOGUI_KEY_NAMES.get(key_name, key_name)
+            on_press(key_name, t_ns)
+
+        def handle_move(x, y):
+            on_move(int(x), int(y), time.perf_counter_ns())
+
+        self._listeners = [
+            mouse.Listener(on_click=handle_click, on_move=handle_move if on_move else None),
+            keyboard.Listener(on_press=handle_press),
+        ]
+        for listener in self._listeners:
+            listener.start()
+
+    def stop(self):
+        for listener in self._listeners:
+            listener.stop()
+
+    def join(self, timeout: Optional[float] = None):
+        for listener in self._listeners:
+            listener.join(timeout)
+
+
+class PyAutoGUIBackend(InputBackend):
+    """Emits input through pyautogui (with its corner failsafe); captures through pynput"""
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self._saved_pause = pyautogui.PAUSE
+
+    def begin(self):
+        pyautogui = self._pyautogui
+        pyautogui.FAILSAFE = True
+        # Step delays are the whole wait between steps; pyautogui's implicit pause
+        # would stretch every gap (and every typed character) by a fixed, unscaled amount
+        self._saved_pause = pyautogui.PAUSE
+        pyautogui.PAUSE = 0
+
+    def end(self):
+        self._pyautogui.PAUSE = self._saved_pause
+
+    def click(self, x: int, y: int, button: str = 'left'):
+        self._pyautogui.click(x, y, button=button)
+
+    def press(self, key: str):
+        self._pyautogui.press(key)
+
+    def type_char(self, char: str):
+        self._pyautogui.typewrite(char)
+
+    def scroll(self, amount: int):
+        self._pyautogui.scroll(amount)
+
+    def move_to(self, x: int, y: int):
+        self._pyautogui.moveTo(x, y)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Any:
+        return self._pyautogui.screenshot(region=region)
+
+    def listen(self, on_click: ClickCallback, on_press: PressCallback,
+               on_move: Optional[MoveCallback] = None) -> InputListener:
+        return _PynputListener(on_click, on_press, on_move)
+
+
+class PynputBackend(InputBackend):
+    """Emits input through raw pynput controllers: no failsafe, no implicit pause"""
+    name = 'pynput'
+
+    def __init__(self):
+        from pynput import mouse, keyboard
+        self._mouse = mouse.Controller()
+        self._keyboard = keyboard.Controller()
+        self._buttons = mouse.Button
+        self._keys = keyboard.Key
+
+    def _key(self, key: str) -> Any:
+        name = PYNPUT_KEY_ALIASES.get(key.lower(), key.lower())
+        special = getattr(self._keys, name, None)
+        if special is not None:
+            return special
+        if len(key) == 1:
+            return key
+        raise ValueError(f"Unknown key name: {key}")
+
+    def click(self, x: int, y: int, button: str = 'left'):
+        self._mouse.position = (x, y)
+        self._mouse.click(getattr(self._buttons, button))
+
+    def press(self, key: str):
+        self._keyboard.tap(self._key(key))
+
+    def type_char(self, char: str):
+        self._keyboard.type(char)
+
+    def scroll(self, amount: int):
+        self._mouse.scroll(0, amount)
+
+    def move_to(self, x: int, y: int):
+        self._mouse.position = (x, y)
+
+    def listen(self, on_click: ClickCallback, on_press: PressCallback,
+               on_move: Optional[MoveCallback] = None) -> InputListener:
+        return _PynputListener(on_click, on_press, on_move)
+
+
+class _TraceListener(InputListener):
+    def __init__(self, backend: 'TraceBackend', on_click: ClickCallback, on_press: PressCallback,
+                 on_move: Optional[MoveCallback]):
+        self.backend = backend
+        self.on_click = on_click
+        self.on_press = on_press
+        self.on_move = on_move
+
+    def stop(self):
+        if self.backend.listener is self:
+            self.backend.listener = None
+
+
+class TraceBackend(InputBackend):
+    """
+    In-memory backend for headless runs: emitted events are recorded as
+    (perf_counter_ns, kind, args) tuples instead of reaching the OS, and
+    capture sessions are fed with inject_click/inject_press/inject_move.
+    grab() returns crops of self.screen, an HxW(xC) array or PIL image set by the caller.
+    :param record: Set False for a pure null backend that keeps nothing.
+    """
+    name = 'trace'
+
+    def __init__(self, record: bool = True):
+        self.record = record
+        self.events: List[Tuple[int, str, Tuple]] = []
+        self.listener: Optional[_TraceListener] = None
+        self.screen: Any = None
+
+    def _emit(self, kind: str, *args):
+        if self.record:
+            self.events.append((time.perf_counter_ns(), kind, args))
+
+    def clear(self):
+        self.events = []
+
+    def click(self, x: int, y: int, button: str = 'left'):
+        self._emit('click', x, y, button)
+
+    def press(self, key: str):
+        self._emit('press', key)
+
+    def type_char(self, char: str):
+        self._emit('type', char)
+
+    def scroll(self, amount: int):
+        self._emit('scroll', amount)
+
+    def move_to(self, x: int, y: int):
+        self._emit('move', x, y)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None) -> Any:
+        if self.screen is None:
+            raise RuntimeError("TraceBackend has no screen image to capture")
+        self._emit('grab', region)
+        if region is None:
+            return self.screen
+        left, top, width, height = region
+        if hasattr(self.screen, 'crop'):
+            return self.screen.crop((left, top, left + width, top + height))
+        return self.screen[top:top + height, left:left + width]
+
+    def listen(self, on_click: ClickCallback, on_press: PressCallback,
+               on_move: Optional[MoveCallback] = None) -> InputListener:
+        self.listener = _TraceListener(self, on_click, on_press, on_move)
+        return self.listener
+
+    def inject_click(self, x: int, y: int, button: str = 'left', t_ns: Optional[int] = None):
+        if self.listener is not None:
+            self.listener.on_click(x, y, button, time.perf_counter_ns() if t_ns is None else t_ns)
+
+    def inject_press(self, key: str, t_ns: Optional[int] = None):
+        if self.listener is not None:
+            self.listener.on_press(key, time.perf_counter_ns() if t_ns is None else t_ns)
+
+    def inject_move(self, x: int, y: int, t_ns: Optional[int] = None):
+        if self.listener is not None and self.listener.on_move is not None:
+            self.listener.on_move(x, y, time.perf_counter_ns() if t_ns is None else t_ns)
+
+
+BACKENDS = {
+    'pyautogui': PyAutoGUIBackend,
+    'pynput': PynputBackend,
+    'trace': TraceBackend,
+}
+
+
+def create_backend(name: str = 'pyautogui') -> InputBackend:
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown input backend: {name}") from None
+    return backend_class()
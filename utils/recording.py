@@ -0,0 +1,182 @@
+"""
+Recording post-processing for KeyKraken
+Turns raw recorded events into compact, replay-friendly steps
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Key names the listener reports for keys that type a character
+NAMED_CHARS = {'space': ' '}
+SHIFT_KEYS = {'shift', 'shift_l', 'shift_r'}
+MIN_TYPE_RUN = 2
+NAME_PREVIEW = 30
+
+# Pointer samples within this many pixels of the simplified path are dropped
+DEFAULT_MOVE_TOLERANCE = 3.0
+# A gap between pointer samples at least this long (seconds) means the pointer rested
+DEFAULT_DWELL = 0.15
+
+
+def _typed_char(step: Dict[str, Any]) -> Optional[str]:
+    """The character a keypress step types, or None for special keys and other steps"""
+    if step.get('type') != 'keypress':
+        return None
+    value = step.get('value')
+    if not isinstance(value, str):
+        return None
+    value = NAMED_CHARS.get(value, value)
+    if len(value) == 1 and value.isprintable():
+        return value
+    return None
+
+
+def _is_shift(step: Dict[str, Any]) -> bool:
+    return step.get('type') == 'keypress' and step.get('value') in SHIFT_KEYS
+
+
+def coalesce_keypresses(steps: List[Dict[str, Any]], min_run: int = MIN_TYPE_RUN) -> List[Dict[str, Any]]:
+    """
+    Merge runs of printable keypresses into single 'type' steps.
+    Special keys (enter, tab, arrows, ...) and non-keyboard steps end a run. A shift
+    press between two characters is dropped, since the character is already shifted.
+    The per-character interval is the mean gap inside the run, and the merged step
+    keeps the last keypress's delay.
+    :param steps: Recorded steps with real delays.
+    :param min_run: Shorter runs are left as individual keypresses.
+    """
+    result = []
+    count = len(steps)
+    i = 0
+    while i < count:
+        run = []  # (char, seconds until the next character)
+        carry = 0.0
+        j = i
+        while j < count:
+            step = steps[j]
+            char = _typed_char(step)
+            if char is not None:
+                run.append((char, carry + float(step.get('delay', 0))))
+                carry = 0.0
+            elif run and _is_shift(step) and j + 1 < count and _typed_char(steps[j + 1]) is not None:
+                carry += float(step.get('delay', 0))
+            else:
+                break
+            j += 1
+
+        if len(run) < min_run:
+            result.append(steps[i])
+            i += 1
+            continue
+
+        text = ''.join(char for char, _ in run)
+        gaps = [delay for _, delay in run[:-1]]
+        preview = text if len(text) <= NAME_PREVIEW else text[:NAME_PREVIEW] + '...'
+        result.append({
+            "name": f"Type: {preview}",
+            "type": "type",
+            "value": text,
+            "interval": round(sum(gaps) / len(gaps), 3),
+            "delay": run[-1][1],
+        })
+        i = j
+    return result
+
+
+def _synchronized_distance(point, start, end) -> float:
+    """
+    Distance from a (t, x, y) sample to where linear-in-time motion from start to
+    end would put the pointer at the sample's time (synchronized Euclidean distance).
+    """
+    (t, x, y), (t0, x0, y0), (t1, x1, y1) = point, start, end
+    fraction = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+    return math.hypot(x - (x0 + (x1 - x0) * fraction), y - (y0 + (y1 - y0) * fraction))
+
+
+def rdp_indices(samples: Sequence[Tuple[int, int, int]], tolerance: float) -> List[int]:
+    """
+    Time-aware Ramer-Douglas-Peucker over (t, x, y) samples: a sample is dropped only
+    if interpolating between the kept neighbours at its timestamp lands within
+    tolerance pixels of it, so replay keeps both the shape and the pace of the path.
+    Iterative, so long paths can't hit the recursion limit.
+    :return: Sorted indices of the samples to keep; always includes both endpoints.
+    """
+    count = len(samples)
+    if count <= 2:
+        return list(range(count))
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_index = 0.0, -1
+        for i in range(first + 1, last):
+            distance = _synchronized_distance(samples[i], samples[first], samples[last])
+            if distance > worst:
+                worst, worst_index = distance, i
+        if worst > tolerance:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+    return [i for i in range(count) if keep[i]]
+
+
+class PathBuilder:
+    """
+    Compresses a stream of pointer samples into a 'path' step.
+    Samples within tolerance of the last kept one are dropped as they arrive. The
+    OS only reports movement, so after a pause of at least dwell seconds a hold
+    sample is inserted at the resting position; the path is then simplified with
+    time-aware Ramer-Douglas-Peucker when it is closed.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_MOVE_TOLERANCE, dwell: float = DEFAULT_DWELL):
+        self.tolerance = tolerance
+        self.dwell_ns = int(dwell * 1e9)
+        self.samples: List[Tuple[int, int, int]] = []
+        self.raw_count = 0
+        self.kept_count = 0
+        self._last = None
+
+    def add(self, t_ns: int, x: int, y: int):
+        self.raw_count += 1
+        samples = self.samples
+        last = self._last
+        self._last = (t_ns, x, y)
+        if last is not None and t_ns - last[0] >= self.dwell_ns:
+            # The pointer rested at the last position until just now
+            samples.append((t_ns, last[1], last[2]))
+        elif samples:
+            _, kept_x, kept_y = samples[-1]
+            if math.hypot(x - kept_x, y - kept_y) <= self.tolerance:
+                return
+        samples.append((t_ns, x, y))
+
+    def close(self) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Finish the current path.
+        :return: (start_ns, end_ns, step) or None if no samples arrived.
+        """
+        samples, self.samples = self.samples, []
+        last, self._last = self._last, None
+        if not samples:
+            return None
+        # Always end exactly where the pointer came to rest
+        if last is not None and samples[-1] != last:
+            samples.append(last)
+
+        kept = [samples[i] for i in rdp_indices(samples, self.tolerance)]
+        self.kept_count += len(kept)
+
+        start_ns, end_ns = kept[0][0], kept[-1][0]
+        x, y = kept[-1][1], kept[-1][2]
+        if len(kept) == 1:
+            step = {"name": f"Move to ({x}, {y})", "type": "move", "value": [x, y], "delay": 0}
+        else:
+            step = {
+                "name": f"Path to ({x}, {y}) via {len(kept)} points",
+                "type": "path",
+                "value": [[px, py, round((t - start_ns) / 1e9, 3)] for t, px, py in kept],
+                "delay": 0,
+            }
+        return start_ns, end_ns, step
@@ -0,0 +1,147 @@
+"""
+Parsed-scenario cache for KeyKraken
+Keeps recently loaded scenarios in memory, keyed by path and validated against
+the file's mtime and size, and warms it in the background for scenarios the
+user is likely to open next.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from utils.scenario_store import load_scenario_file, BINARY_EXTENSION
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+# Parsed JSON takes several times its file size in Python objects; binary
+# scenarios are mapped and decoded on access, so they cost about their size
+JSON_MEMORY_FACTOR = 8
+PREFETCH_WORKERS = 2
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _weight(path: Path, size: int) -> int:
+    return size if path.suffix == BINARY_EXTENSION else size * JSON_MEMORY_FACTOR
+
+
+class ScenarioCache:
+    """
+    Thread-safe LRU cache of parsed scenario dicts, capped by estimated memory.
+    An entry is only served while the file's (mtime, size) still match; a load
+    already in progress on another thread is waited for rather than repeated.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Path, Tuple[Tuple[int, int], int, Dict[str, Any]]]" = OrderedDict()
+        self._loading: Dict[Tuple[Path, Tuple[int, int]], Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Callers get their own step list, so editing it can't change the cached one"""
+        data = dict(data)
+        steps = data.get('steps')
+        if isinstance(steps, list):
+            data['steps'] = list(steps)
+        return data
+
+    def contains(self, path: Union[str, Path]) -> bool:
+        path = Path(path)
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry is not None and entry[0] == stamp
+
+    def get(self, path: Union[str, Path]) -> Dict[str, Any]:
+        """Load a scenario through the cache; raises like load_scenario_file"""
+        path = Path(path)
+        stamp = _stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return self._copy(entry[2])
+            self.misses += 1
+            future = self._loading.get((path, stamp))
+            owner = future is None
+            if owner:
+                future = self._loading[(path, stamp)] = Future()
+
+        if owner:
+            try:
+                data = load_scenario_file(path)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(data)
+                self._store(path, stamp, data)
+            finally:
+                with self._lock:
+                    self._loading.pop((path, stamp), None)
+        return self._copy(future.result())
+
+    def _store(self, path: Path, stamp: Tuple[int, int], data: Dict[str, Any]):
+        weight = _weight(path, stamp[1])
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if weight > self.max_bytes:
+                return
+            self._entries[path] = (stamp, weight, data)
+            self.total_bytes += weight
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def discard(self, path: Union[str, Path]):
+        with self._lock:
+            entry = self._entries.pop(Path(path), None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+
+
+class ScenarioPrefetcher:
+    """
+    Warms a ScenarioCache on a small thread pool.
+    Each prefetch call replaces the previous request: queued loads that haven't
+    started are cancelled, so fast scrolling doesn't build a backlog.
+    """
+
+    def __init__(self, cache: ScenarioCache, workers: int = PREFETCH_WORKERS):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scenario-prefetch")
+        self._queued: List[Future] = []
+
+    def _warm(self, path: Path):
+        try:
+            self.cache.get(path)
+        except Exception:
+            # The user will see the error if they actually open it
+            pass
+
+    def prefetch(self, paths: Iterable[Union[str, Path]]):
+        for future in self._queued:
+            future.cancel()
+        self._queued = [self._pool.submit(self._warm, Path(path))
+                        for path in paths if not self.cache.contains(path)]
+
+    def shutdown(self):
+        for future in self._queued:
+            future.cancel()
+        self._pool.shutdown(wait=False)
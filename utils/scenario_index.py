@@ -0,0 +1,178 @@
+"""
+Scenario metadata index for KeyKraken
+Keeps name, description, step count, step-type histogram, mtime and size of every
+scenario file in a SQLite database beside them, so the scenario list can be shown,
+sorted and filtered without opening the files. Refreshing only re-reads files whose
+mtime or size changed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from utils.scenario_store import BinaryScenario, BINARY_EXTENSION, SCENARIO_EXTENSIONS
+
+INDEX_FILENAME = ".keykraken_index.sqlite"
+SCHEMA_VERSION = 1
+
+SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE ASC',
+    'modified': 'mtime_ns DESC',
+    'steps': 'step_count DESC',
+    'size': 'size DESC',
+}
+
+
+def read_metadata(path: Path) -> Dict[str, Any]:
+    """Parse just enough of a scenario file to index it"""
+    if path.suffix == BINARY_EXTENSION:
+        scenario = BinaryScenario(path)
+        try:
+            return {
+                "name": scenario.name,
+                "description": scenario.description,
+                "saved_at": scenario.saved_at,
+                "step_count": scenario.step_count,
+                "type_counts": scenario.type_counts(),
+            }
+        finally:
+            scenario.close()
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    steps = data.get('steps', [])
+    return {
+        "name": str(data.get('name', '')),
+        "description": str(data.get('description', '')),
+        "saved_at": str(data.get('saved_at', '')),
+        "step_count": len(steps),
+        "type_counts": dict(Counter(
+            str(step.get('type', '')) if isinstance(step, dict) else '' for step in steps
+        )),
+    }
+
+
+class ScenarioIndex:
+    """
+    SQLite-backed index of a scenarios directory.
+    Falls back to an in-memory database if the directory isn't writable.
+    Safe to share between threads, e.g. to refresh in the background at startup.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        try:
+            self.db = sqlite3.connect(str(self.directory / INDEX_FILENAME), check_same_thread=False)
+            self._create_schema()
+        except sqlite3.Error:
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._create_schema()
+        self.db.row_factory = sqlite3.Row
+
+    def _create_schema(self):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS scenarios")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS scenarios (
+                file TEXT PRIMARY KEY,
+                stem TEXT NOT NULL,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                saved_at TEXT NOT NULL,
+                step_count INTEGER NOT NULL,
+                type_counts TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                error TEXT
+            )
+        """)
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.commit()
+
+    def _row_values(self, file_name: str, stat: os.stat_result) -> Tuple:
+        path = self.directory / file_name
+        try:
+            meta = read_metadata(path)
+            error = None
+        except Exception as e:
+            meta = {"name": path.stem, "description": "", "saved_at": "",
+                    "step_count": 0, "type_counts": {}}
+            error = str(e)
+        return (file_name, path.stem, meta["name"] or path.stem, meta["description"],
+                meta["saved_at"], meta["step_count"], json.dumps(meta["type_counts"]),
+                stat.st_mtime_ns, stat.st_size, error)
+
+    def refresh(self, files: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+        """
+        Bring the index up to date with the directory.
+        Only files whose mtime or size differ from the index are read.
+        :param files: Only re-check these file names (e.g. from a watcher); default all.
+        :return: (names of files re-read, names of files removed)
+        """
+        with self._lock:
+            known = {row[0]: (row[1], row[2])
+                     for row in self.db.execute("SELECT file, mtime_ns, size FROM scenarios")}
+        if files is None:
+            files = set(known)
+            files.update(entry.name for entry in os.scandir(self.directory))
+
+        changed, removed = [], []
+        for file_name in files:
+            if not self._is_scenario(file_name):
+                continue
+            try:
+                stat = os.stat(self.directory / file_name)
+            except FileNotFoundError:
+                if file_name in known:
+                    removed.append((file_name,))
+                continue
+            if known.get(file_name) != (stat.st_mtime_ns, stat.st_size):
+                changed.append(self._row_values(file_name, stat))
+
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", changed
+            )
+            self.db.executemany("DELETE FROM scenarios WHERE file = ?", removed)
+        return [row[0] for row in changed], [row[0] for row in removed]
+
+    @staticmethod
+    def _is_scenario(file_name: str) -> bool:
+        return not file_name.startswith('.') and os.path.splitext(file_name)[1] in SCENARIO_EXTENSIONS
+
+    def entries(self, sort: str = 'name', text: str = '') -> List[Dict[str, Any]]:
+        """
+        Indexed scenarios, one per name (the newest file if a name exists in both formats).
+        :param sort: One of SORT_COLUMNS.
+        :param text: Case-insensitive filter on file name, scenario name and description.
+        """
+        pattern = f"%{text}%"
+        with self._lock:
+            rows = self._query(sort, pattern)
+        result = []
+        for row in rows:
+            entry = dict(row)
+            entry["path"] = self.directory / row["file"]
+            entry["type_counts"] = json.loads(row["type_counts"])
+            result.append(entry)
+        return result
+
+    def _query(self, sort: str, pattern: str) -> List[sqlite3.Row]:
+        return self.db.execute(f"""
+            SELECT * FROM scenarios AS s
+            WHERE (stem LIKE :p OR name LIKE :p OR description LIKE :p)
+              AND NOT EXISTS (SELECT 1 FROM scenarios AS t
+                              WHERE t.stem = s.stem AND (t.mtime_ns > s.mtime_ns
+                                   OR (t.mtime_ns = s.mtime_ns AND t.file > s.file)))
+            ORDER BY {SORT_COLUMNS[sort]}, stem
+        """, {"p": pattern}).fetchall()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
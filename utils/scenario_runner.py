@@ -1,44 +1,233 @@
-import os
-import json
+"""
+Batch runner for KeyKraken
+Runs a queue of scenarios back-to-back on the calling thread with a single input
+backend. While one scenario runs, the next is loaded and compiled on a helper
+thread, so the gap between scenarios is only the configured pause. Qt-free: the
+GUI wraps it in a QThread and the command line runs it directly.
+"""
+
+import threading
 import time
-from tkinter import messagebox
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from utils.delay_tuning import DelayTuner, tuning_path
+from utils.engine import MacroEngine, STOPPED_MESSAGE
+from utils.input_backend import InputBackend, create_backend
+from utils.scenario_store import load_scenario_file
+from utils.step_plan import PlanOp, StepValidationError
+
+# Pause between two scenarios, in seconds
+DEFAULT_GAP = 1.0
+
+# Called with an event name and its fields: batch_started, scenario_started,
+# iteration, scenario_finished, batch_finished
+EventCallback = Callable[[str, Dict[str, Any]], None]
 
-def load_scenario(file_path):
-    """Load a scenario from a JSON file."""
+
+def load_scenario(file_path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Load a scenario from a JSON or binary (.kks) file, or None if it can't be read"""
     try:
-        with open(file_path, 'r') as file:
-            scenario = json.load(file)
-        return scenario
+        return load_scenario_file(file_path)
     except Exception as e:
         print(f"Error loading scenario: {e}")
         return None
 
-def run_scenario(scenario, automation_func):
+
+class _Prepared:
+    """A scenario loaded and compiled ahead of its turn"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.stem
+        self.engine: Optional[MacroEngine] = None
+        self.plan: Optional[List[PlanOp]] = None
+        self.error: Optional[str] = None
+        self.prepare_seconds = 0.0
+
+
+class BatchRunner:
     """
-    Run a single scenario.
-    :param scenario: The scenario data (list of steps).
-    :param automation_func: The function to execute the steps.
+    Runs scenarios in order.
+    Progress is published to self.progress as (scenario number, scenario count,
+    iteration, step index) for observers to sample; events go to on_event.
+    :param iterations: Iterations per scenario; None uses each scenario's
+        'loops' value (default 1).
+    :param gap: Seconds to pause between scenarios.
+    :param start_delay: Seconds to wait before the first scenario (e.g. to let
+        the user position windows), interruptible by stop().
+    :param stop_on_failure: End the batch at the first failed scenario.
+    :param adaptive: Tune the delays of verified steps, loading and saving
+        each scenario's learned delays beside it.
+    :param capture_freshness: Passed to each scenario's MacroEngine.
     """
-    try:
-        steps = scenario.get("steps", [])
-        loops = int(scenario.get("loops", 1))
-        print(f"Running scenario: {scenario.get('name', 'Unnamed')} with {loops} loop(s).")
-        automation_func(steps, loops)
-    except Exception as e:
-        print(f"Error running scenario: {e}")
 
-def run_multiple_scenarios(scenario_files, automation_func):
+    def __init__(self, paths: Sequence[Union[str, Path]], iterations: Optional[int] = None,
+                 timing: str = 'relative', speed: float = 1.0, gap: float = DEFAULT_GAP,
+                 start_delay: float = 0.0, stop_on_failure: bool = False, adaptive: bool = False,
+                 backend: Optional[InputBackend] = None, on_event: Optional[EventCallback] = None,
+                 capture_freshness: Optional[float] = None):
+        if not MacroEngine.MIN_SPEED <= speed <= MacroEngine.MAX_SPEED:
+            raise ValueError(f"Replay speed must be between {MacroEngine.MIN_SPEED}x and {MacroEngine.MAX_SPEED}x")
+        self.paths = [Path(path) for path in paths]
+        self.iterations = iterations
+        self.timing = timing
+        self.speed = speed
+        self.gap = gap
+        self.start_delay = start_delay
+        self.stop_on_failure = stop_on_failure
+        self.adaptive = adaptive
+        self.backend = backend
+        self.on_event = on_event
+        self.capture_freshness = capture_freshness
+        self.results: List[Dict[str, Any]] = []
+        self._number = 0
+        self._engine: Optional[MacroEngine] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def progress(self) -> Optional[Tuple[int, int, int, int]]:
+        engine = self._engine
+        if engine is None or engine.progress is None:
+            return None
+        iteration, step = engine.progress
+        return self._number, len(self.paths), iteration, step
+
+    @property
+    def current_steps(self) -> Sequence[Dict[str, Any]]:
+        engine = self._engine
+        return engine.steps if engine is not None else []
+
+    @property
+    def should_stop(self) -> bool:
+        return self._stop_event.is_set()
+
+    def _emit(self, event: str, **fields: Any):
+        if self.on_event is not None:
+            self.on_event(event, fields)
+
+    def _prepare(self, number: int) -> _Prepared:
+        path = self.paths[number - 1]
+        prepared = _Prepared(path)
+        started = time.perf_counter()
+        try:
+            data = load_scenario_file(path)
+            prepared.name = data.get('name') or path.stem
+            iterations = self.iterations
+            if iterations is None:
+                iterations = int(data.get('loops', 1))
+            steps = data.get('steps', [])
+            prepared.engine = MacroEngine(
+                steps, iterations, self.timing, self.backend, self.speed,
+                on_iteration=lambda i, n: self._emit("iteration", scenario=number, iteration=i, iterations=n),
+                base_dir=path.parent, tuner=DelayTuner(tuning_path(path), steps) if self.adaptive else None,
+                capture_freshness=self.capture_freshness
+            )
+            prepared.plan = prepared.engine.compile()
+        except StepValidationError as e:
+            prepared.error = f"Invalid scenario: {str(e)}"
+        except Exception as e:
+            prepared.error = f"Failed to load scenario: {str(e)}"
+        prepared.prepare_seconds = time.perf_counter() - started
+        return prepared
+
+    def run(self) -> bool:
+        """
+        Run the whole batch; blocks until it ends.
+        :return: True if every scenario succeeded.
+        """
+        stop = self._stop_event
+        self.results = []
+        if self.backend is None:
+            self.backend = create_backend()
+        self._emit("batch_started", scenarios=[str(path) for path in self.paths])
+        started = time.perf_counter()
+
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-preload")
+        try:
+            upcoming: Optional[Future] = loader.submit(self._prepare, 1) if self.paths else None
+            if self.start_delay > 0:
+                stop.wait(self.start_delay)
+            for number in range(1, len(self.paths) + 1):
+                if stop.is_set():
+                    break
+                prepared = upcoming.result()
+                upcoming = loader.submit(self._prepare, number + 1) if number < len(self.paths) else None
+
+                result = self._run_prepared(number, prepared)
+                self.results.append(result)
+                if not result["success"] and self.stop_on_failure:
+                    break
+                if upcoming is not None and self.gap > 0:
+                    stop.wait(self.gap)
+        finally:
+            loader.shutdown(wait=False, cancel_futures=True)
+            self._engine = None
+
+        success = len(self.results) == len(self.paths) and all(r["success"] for r in self.results)
+        self._emit("batch_finished", success=success, completed=len(self.results),
+                   scenarios=len(self.paths), elapsed=round(time.perf_counter() - started, 3))
+        return success
+
+    def _run_prepared(self, number: int, prepared: _Prepared) -> Dict[str, Any]:
+        self._number = number
+        self._emit("scenario_started", scenario=number, scenarios=len(self.paths),
+                   name=prepared.name, path=str(prepared.path))
+        result = {"name": prepared.name, "path": str(prepared.path),
+                  "prepare_seconds": round(prepared.prepare_seconds, 4)}
+        run_started = time.perf_counter()
+        if prepared.error is not None:
+            success, message = False, prepared.error
+        else:
+            self._engine = prepared.engine
+            if self._stop_event.is_set():
+                success, message = False, STOPPED_MESSAGE
+            else:
+                success, message = prepared.engine.run(prepared.plan)
+            self._engine = None
+            if prepared.engine.timing_report is not None:
+                result["timing"] = prepared.engine.timing_report
+            if prepared.engine.wait_report is not None:
+                result["waits"] = prepared.engine.wait_report
+            if prepared.engine.tuner is not None:
+                result["tuning"] = prepared.engine.tuner.report()
+                try:
+                    prepared.engine.tuner.save()
+                except OSError as e:
+                    result["tuning_error"] = f"Could not save learned delays: {e}"
+        result.update(success=success, message=message,
+                      run_seconds=round(time.perf_counter() - run_started, 3))
+        self._emit("scenario_finished", scenario=number, **result)
+        return result
+
+    def summary(self) -> str:
+        """Human-readable per-scenario results"""
+        lines = []
+        for number, result in enumerate(self.results, 1):
+            status = "OK" if result["success"] else "FAILED"
+            lines.append(f"{number}. {result['name']}: {status} in {result['run_seconds']:.1f} s"
+                         + ("" if result["success"] else f" ({result['message'].splitlines()[0]})")
+                         + (f"; {result['tuning_error']}" if "tuning_error" in result else ""))
+        skipped = len(self.paths) - len(self.results)
+        if skipped:
+            lines.append(f"{skipped} scenario(s) not run")
+        return "\n".join(lines)
+
+    def stop(self):
+        self._stop_event.set()
+        engine = self._engine
+        if engine is not None:
+            engine.stop()
+
+
+def run_multiple_scenarios(scenario_files: Sequence[Union[str, Path]], **options) -> List[Dict[str, Any]]:
     """
     Run multiple scenarios back-to-back.
     :param scenario_files: List of file paths to the scenarios.
-    :param automation_func: The function to execute the steps.
+    :param options: BatchRunner options (iterations, timing, speed, gap, ...).
+    :return: Per-scenario results.
     """
-    for file_path in scenario_files:
-        print(f"Loading scenario: {file_path}")
-        scenario = load_scenario(file_path)
-        if scenario:
-            run_scenario(scenario, automation_func)
-            time.sleep(1)  # Optional delay between scenarios
-        else:
-            print(f"Skipping scenario: {file_path}")
-    messagebox.showinfo("Scenarios Complete", "All scenarios have been executed.")
\ No newline at end of file
+    runner = BatchRunner(scenario_files, **options)
+    runner.run()
+    return runner.results
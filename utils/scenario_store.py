@@ -0,0 +1,329 @@
+"""
+Scenario storage for KeyKraken
+Reads and writes scenarios as JSON or as the compact binary .kks format:
+
+    header | fixed-width step records | string table (end offsets + UTF-8 blob)
+
+Binary scenarios are memory-mapped and their steps decoded one at a time on
+access, so opening a huge scenario costs a header read, not a full parse.
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+JSON_EXTENSION = '.json'
+BINARY_EXTENSION = '.kks'
+SCENARIO_EXTENSIONS = (JSON_EXTENSION, BINARY_EXTENSION)
+
+MAGIC = b'KKSC'
+FORMAT_VERSION = 1
+# magic, format version, flags, step count, string count,
+# name/description/saved_at/extra string ids, records offset, strings offset
+HEADER = struct.Struct('<4sHHIIIIIIQQ')
+# kind, flags, reserved, name id, value id, int0, int1, delay, aux
+RECORD = struct.Struct('<BBHIIiidd')
+OFFSET = struct.Struct('<Q')
+NO_STRING = 0xFFFFFFFF
+
+# Kind 0 stores the whole step as JSON in the value string, for anything the
+# fixed layouts can't represent exactly (unknown types, extra keys, odd values)
+KIND_JSON = 0
+KIND_CODES = {'click': 1, 'keypress': 2, 'type': 3, 'scroll': 4, 'move': 5, 'path': 6, 'delay': 7}
+KIND_NAMES = {code: name for name, code in KIND_CODES.items()}
+BUTTON_CODES = {'left': 0, 'right': 1, 'middle': 2}
+BUTTON_NAMES = {code: name for name, code in BUTTON_CODES.items()}
+FLAG_HAS_AUX = 1
+
+HEADER_KEYS = ('name', 'description', 'saved_at', 'steps')
+
+
+class ScenarioFormatError(ValueError):
+    """Raised when a binary scenario file is malformed"""
+
+
+def _decode_record(kind: int, flags: int, name: Optional[str], value: Optional[str],
+                   int0: int, int1: int, delay: float, aux: float) -> Dict[str, Any]:
+    if kind == KIND_JSON:
+        return json.loads(value)
+    step_type = KIND_NAMES.get(kind)
+    if step_type is None:
+        raise ScenarioFormatError(f"Unknown step record kind {kind}")
+    step = {"name": name, "type": step_type}
+    if step_type in ('click', 'move'):
+        step["value"] = [int0, int1]
+    elif step_type in ('keypress', 'type'):
+        step["value"] = value
+    elif step_type == 'scroll':
+        step["value"] = int0
+    elif step_type == 'path':
+        step["value"] = json.loads(value)
+    elif step_type == 'delay':
+        step["value"] = aux
+    step["delay"] = delay
+    if step_type == 'click':
+        step["button"] = BUTTON_NAMES[flags]
+    elif step_type == 'type' and flags & FLAG_HAS_AUX:
+        step["interval"] = aux
+    return step
+
+
+def _encode_fields(step: Dict[str, Any]) -> Tuple:
+    """Fixed-layout fields for step, or a KIND_JSON record if the layout would lose anything"""
+    fields = None
+    step_type = step.get('type') if isinstance(step, dict) else None
+    kind = KIND_CODES.get(step_type)
+    if kind is not None:
+        try:
+            name = step['name']
+            value = step['value']
+            delay = float(step['delay'])
+            flags, int0, int1, aux, text = 0, 0, 0, 0.0, None
+            if step_type in ('click', 'move'):
+                int0, int1 = value
+                if step_type == 'click':
+                    flags = BUTTON_CODES[step['button']]
+            elif step_type in ('keypress', 'type'):
+                text = value
+                if step_type == 'type' and 'interval' in step:
+                    flags, aux = FLAG_HAS_AUX, float(step['interval'])
+            elif step_type == 'scroll':
+                int0 = value
+            elif step_type == 'path':
+                text = json.dumps(value, separators=(',', ':'))
+            elif step_type == 'delay':
+                aux = float(value)
+            fields = (kind, flags, name, text, int0, int1, delay, aux)
+            RECORD.pack(kind, flags, 0, 0, 0, int0, int1, delay, aux)
+            if not isinstance(name, str) or _decode_record(*fields) != step:
+                fields = None
+        except (KeyError, TypeError, ValueError, struct.error):
+            fields = None
+    if fields is None:
+        fields = (KIND_JSON, 0, None, json.dumps(step, separators=(',', ':')), 0, 0, 0.0, 0.0)
+    return fields
+
+
+class BinaryScenario:
+    """
+    Read-only view of a .kks file.
+    Memory-mapped where the platform allows replacing a mapped file (not Windows),
+    otherwise read into memory in one call; either way nothing is parsed up front.
+    """
+
+    def __init__(self, path: Union[str, Path], use_mmap: Optional[bool] = None):
+        self.path = Path(path)
+        if use_mmap is None:
+            use_mmap = os.name != 'nt'
+        with open(self.path, 'rb') as f:
+            if use_mmap and os.fstat(f.fileno()).st_size >= HEADER.size:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buffer = f.read()
+        if len(self._buffer) < HEADER.size:
+            raise ScenarioFormatError(f"{self.path.name}: file too short")
+        (magic, version, _, self.step_count, self.string_count,
+         name_sid, description_sid, saved_at_sid, extra_sid,
+         self._records_offset, strings_offset) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ScenarioFormatError(f"{self.path.name}: not a KeyKraken binary scenario")
+        if version > FORMAT_VERSION:
+            raise ScenarioFormatError(f"{self.path.name}: format version {version} is newer than supported")
+        self._index_offset = strings_offset
+        self._blob_offset = strings_offset + OFFSET.size * (self.string_count + 1)
+        if self._records_offset + RECORD.size * self.step_count > strings_offset \
+                or self._blob_offset > len(self._buffer):
+            raise ScenarioFormatError(f"{self.path.name}: truncated file")
+
+        self.name = self.string(name_sid) or ''
+        self.description = self.string(description_sid) or ''
+        self.saved_at = self.string(saved_at_sid) or ''
+        extra = self.string(extra_sid)
+        self.extra = json.loads(extra) if extra else {}
+
+    def string(self, sid: int) -> Optional[str]:
+        if sid == NO_STRING:
+            return None
+        if sid >= self.string_count:
+            raise ScenarioFormatError(f"{self.path.name}: bad string id {sid}")
+        start, = OFFSET.unpack_from(self._buffer, self._index_offset + OFFSET.size * sid)
+        end, = OFFSET.unpack_from(self._buffer, self._index_offset + OFFSET.size * (sid + 1))
+        return bytes(self._buffer[self._blob_offset + start:self._blob_offset + end]).decode('utf-8')
+
+    def step(self, index: int) -> Dict[str, Any]:
+        kind, flags, _, name_sid, value_sid, int0, int1, delay, aux = RECORD.unpack_from(
+            self._buffer, self._records_offset + RECORD.size * index)
+        return _decode_record(kind, flags, self.string(name_sid), self.string(value_sid),
+                              int0, int1, delay, aux)
+
+    def type_counts(self) -> Dict[str, int]:
+        """Step type histogram, read from the record kind bytes without decoding steps"""
+        counts: Dict[str, int] = {}
+        for index in range(self.step_count):
+            offset = self._records_offset + RECORD.size * index
+            kind = self._buffer[offset]
+            if kind == KIND_JSON:
+                step = self.step(index)
+                step_type = str(step.get('type', '')) if isinstance(step, dict) else ''
+            else:
+                step_type = KIND_NAMES.get(kind, '')
+            counts[step_type] = counts.get(step_type, 0) + 1
+        return counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = dict(self.extra)
+        data.update(name=self.name, description=self.description,
+                    steps=LazySteps(self), saved_at=self.saved_at)
+        return data
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+class LazySteps(Sequence):
+    """Immutable sequence of step dicts decoded from a BinaryScenario on access"""
+
+    def __init__(self, scenario: BinaryScenario):
+        self.scenario = scenario
+
+    def __len__(self) -> int:
+        return self.scenario.step_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.scenario.step(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+        return self.scenario.step(index)
+
+
+def write_binary_scenario(path: Union[str, Path], data: Dict[str, Any]):
+    """Write data (a scenario dict; steps may be any iterable) as a .kks file"""
+    strings: List[bytes] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(text: Optional[str]) -> int:
+        if text is None:
+            return NO_STRING
+        sid = string_ids.get(text)
+        if sid is None:
+            sid = string_ids[text] = len(strings)
+            strings.append(text.encode('utf-8'))
+        return sid
+
+    records = bytearray()
+    step_count = 0
+    for step in data.get('steps', []):
+        kind, flags, name, value, int0, int1, delay, aux = _encode_fields(step)
+        records += RECORD.pack(kind, flags, 0, intern(name), intern(value), int0, int1, delay, aux)
+        step_count += 1
+
+    extra = {key: value for key, value in data.items() if key not in HEADER_KEYS}
+    name_sid = intern(str(data.get('name', '')))
+    description_sid = intern(str(data.get('description', '')))
+    saved_at_sid = intern(str(data.get('saved_at', '')))
+    extra_sid = intern(json.dumps(extra)) if extra else NO_STRING
+
+    records_offset = HEADER.size
+    strings_offset = records_offset + len(records)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, step_count, len(strings),
+                         name_sid, description_sid, saved_at_sid, extra_sid,
+                         records_offset, strings_offset)
+
+    index = bytearray()
+    end = 0
+    index += OFFSET.pack(0)
+    for encoded in strings:
+        end += len(encoded)
+        index += OFFSET.pack(end)
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(records)
+        f.write(index)
+        for encoded in strings:
+            f.write(encoded)
+
+
+def _write_json_scenario(path: Union[str, Path], data: Dict[str, Any]):
+    data = dict(data)
+    steps = data.get('steps', [])
+    if not isinstance(steps, list):
+        data['steps'] = list(steps)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def scenario_files(directory: Union[str, Path]) -> Dict[str, Path]:
+    """Scenario name -> file; if a name exists in both formats the newer file wins"""
+    found: Dict[str, Path] = {}
+    for extension in SCENARIO_EXTENSIONS:
+        for path in Path(directory).glob(f"*{extension}"):
+            if path.name.startswith('.'):
+                continue
+            current = found.get(path.stem)
+            if current is None or path.stat().st_mtime > current.stat().st_mtime:
+                found[path.stem] = path
+    return found
+
+
+def scenario_paths(directory: Union[str, Path], name: str) -> List[Path]:
+    """Every file a scenario of this name may be stored in"""
+    return [Path(directory) / f"{name}{extension}" for extension in SCENARIO_EXTENSIONS]
+
+
+def load_scenario_file(path: Union[str, Path]) -> Dict[str, Any]:
+    """Load a scenario dict; binary scenarios come back with lazily decoded steps"""
+    path = Path(path)
+    if path.suffix == BINARY_EXTENSION:
+        return BinaryScenario(path).to_dict()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _fsync_file(path: Path):
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_directory(directory: Path):
+    """Persist a rename; directories can't be opened for syncing on Windows"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_scenario_file(path: Union[str, Path], data: Dict[str, Any], durable: bool = True):
+    """
+    Save a scenario dict in the format given by the path's extension.
+    The file is written beside the target and swapped in, never truncated in
+    place: the steps being saved may be lazily read from a mapping of that file,
+    and a crash mid-write leaves the previous version intact.
+    :param durable: fsync the file before the swap and the directory after it.
+    """
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        if path.suffix == BINARY_EXTENSION:
+            write_binary_scenario(temp_path, data)
+        else:
+            _write_json_scenario(temp_path, data)
+        if durable:
+            _fsync_file(temp_path)
+        os.replace(temp_path, path)
+        if durable:
+            _fsync_directory(path.parent)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
@@ -0,0 +1,103 @@
+"""
+Deadline scheduler for KeyKraken
+Keeps step timing on an absolute monotonic schedule so delays don't drift
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Below this much remaining time, stop sleeping and spin to the deadline.
+# OS sleep granularity is ~1 ms on Linux/macOS and up to ~15 ms on Windows.
+SPIN_THRESHOLD_NS = 2_000_000
+
+
+def sleep_until(deadline_ns: int, spin_ns: int = SPIN_THRESHOLD_NS,
+                stop_event: Optional[threading.Event] = None) -> Optional[int]:
+    """
+    Block until perf_counter_ns() reaches deadline_ns.
+    Sleeps coarsely while far away, then spins for the final stretch.
+    :param stop_event: If given, the coarse sleep waits on it and returns early once set.
+    :return: How late we woke up, in nanoseconds, or None if interrupted.
+    """
+    while True:
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining <= 0:
+            return -remaining
+        if remaining > spin_ns:
+            seconds = (remaining - spin_ns) / 1e9
+            if stop_event is None:
+                time.sleep(seconds)
+            elif stop_event.wait(seconds):
+                return None
+        else:
+            time.sleep(0)
+
+
+class DeadlineScheduler:
+    """
+    Computes absolute start deadlines for each step and records lateness.
+    Step N+1 is due at (start of step N's slot + step N's scripted duration +
+    step N's delay), regardless of how long step N's input calls actually took,
+    so error never accumulates. The scripted duration covers steps that play
+    out over time themselves, like typing a string.
+    """
+
+    def __init__(self, step_count: int, spin_ns: int = SPIN_THRESHOLD_NS,
+                 stop_event: Optional[threading.Event] = None):
+        self.spin_ns = spin_ns
+        self.stop_event = stop_event
+        self.origin_ns = 0
+        self.next_ns = 0
+        self.end_late_ns = 0
+        self._count = [0] * step_count
+        self._total_ns = [0] * step_count
+        self._max_ns = [0] * step_count
+
+    def start(self):
+        self.origin_ns = time.perf_counter_ns()
+        self.next_ns = self.origin_ns
+
+    def wait(self, index: int) -> bool:
+        """
+        Wait for the current deadline and record lateness for step index.
+        :return: False if the stop event interrupted the wait.
+        """
+        late = sleep_until(self.next_ns, self.spin_ns, self.stop_event)
+        if late is None:
+            return False
+        self._count[index] += 1
+        self._total_ns[index] += late
+        if late > self._max_ns[index]:
+            self._max_ns[index] = late
+        return True
+
+    def advance(self, seconds: float):
+        self.next_ns += int(seconds * 1_000_000_000)
+
+    def rebase(self):
+        """Restart the schedule from now, after a step that took an unpredictable time"""
+        self.next_ns = time.perf_counter_ns()
+
+    def finish(self):
+        """Hold until the last step's delay has elapsed on the schedule"""
+        self.end_late_ns = sleep_until(self.next_ns, self.spin_ns, self.stop_event) or 0
+
+    def report(self) -> Dict[str, Any]:
+        """Per-step and overall lateness in milliseconds, plus end-of-run drift"""
+        steps = []
+        for index, count in enumerate(self._count):
+            if count:
+                steps.append({
+                    "index": index,
+                    "runs": count,
+                    "mean_ms": self._total_ns[index] / count / 1e6,
+                    "max_ms": self._max_ns[index] / 1e6,
+                })
+        runs = sum(self._count)
+        return {
+            "steps": steps,
+            "mean_ms": sum(self._total_ns) / runs / 1e6 if runs else 0.0,
+            "max_ms": max(self._max_ns, default=0) / 1e6,
+            "drift_ms": self.end_late_ns / 1e6,
+        }
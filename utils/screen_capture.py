@@ -0,0 +1,141 @@
+"""
+Screen capture service for KeyKraken
+Steps that look at the screen (image anchors, pixel checks, waits for a region
+to change) capture through one ScreenCapture per run. Only the requested region
+is grabbed, and a frame is reused by every lookup inside it for a short
+freshness window, so several checks at the same moment cost one capture. Tile
+hashes give waits a cheap way to tell which parts of a region changed without
+keeping or comparing whole frames.
+
+Needs NumPy; import this module only when a step actually reads the screen.
+"""
+
+import time
+import zlib
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.step_plan import Region
+
+# Seconds a captured frame is shared between lookups
+DEFAULT_FRESHNESS = 0.05
+# Edge length in pixels of the tiles hashed for change detection
+TILE_SIZE = 32
+
+
+class Frame:
+    """Pixels captured from a screen region, as an HxWxC (or HxW) uint8 array"""
+    __slots__ = ('pixels', 'region', 'captured_at')
+
+    def __init__(self, pixels: np.ndarray, region: Region, captured_at: float):
+        self.pixels = pixels
+        self.region = region
+        self.captured_at = captured_at
+
+    def covers(self, region: Region) -> bool:
+        left, top, width, height = self.region
+        x, y, w, h = region
+        return left <= x and top <= y and x + w <= left + width and y + h <= top + height
+
+    def crop(self, region: Region) -> np.ndarray:
+        """A view (not a copy) of region, which must be covered by the frame"""
+        x, y, w, h = region
+        x -= self.region[0]
+        y -= self.region[1]
+        return self.pixels[y:y + h, x:x + w]
+
+
+def tile_hashes(pixels: np.ndarray, tile: int = TILE_SIZE) -> np.ndarray:
+    """
+    CRC-32 of every tile x tile block (edge blocks may be smaller), as a
+    (rows, columns) array. Two captures of the same region compare equal
+    tile-for-tile exactly where their pixels are identical.
+    """
+    height, width = pixels.shape[:2]
+    hashes = np.empty(((height + tile - 1) // tile, (width + tile - 1) // tile), dtype=np.uint32)
+    crc32 = zlib.crc32
+    for row, y in enumerate(range(0, height, tile)):
+        band = pixels[y:y + tile]
+        for column, x in enumerate(range(0, width, tile)):
+            hashes[row, column] = crc32(band[:, x:x + tile].tobytes())
+    return hashes
+
+
+def dirty_tiles(before: np.ndarray, after: np.ndarray, region: Region,
+                tile: int = TILE_SIZE) -> List[Region]:
+    """Screen rectangles of the tiles whose hashes differ between two hashings of region"""
+    if before.shape != after.shape:
+        return [region]
+    left, top, width, height = region
+    dirty = []
+    for row, column in zip(*np.nonzero(before != after)):
+        x, y = left + int(column) * tile, top + int(row) * tile
+        dirty.append((x, y, min(tile, left + width - x), min(tile, top + height - y)))
+    return dirty
+
+
+class ScreenCapture:
+    """
+    Captures screen regions through grab, sharing frames for freshness seconds.
+    A request is served from the last frame if that frame is fresh enough and
+    covers the region; otherwise only the requested region is grabbed. Call
+    invalidate() after emitting input, since the screen may have changed.
+    :param grab: Captures a region (or the whole screen for None) and returns a
+        PIL image or array, e.g. InputBackend.grab.
+    """
+
+    def __init__(self, grab: Callable[[Optional[Region]], Any], freshness: float = DEFAULT_FRESHNESS):
+        self.grab = grab
+        self.freshness = freshness
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.grabs = 0
+        self.reuses = 0
+        self._frame: Optional[Frame] = None
+
+    def invalidate(self):
+        self._frame = None
+
+    def frame(self, region: Optional[Region] = None, max_age: Optional[float] = None) -> Frame:
+        """A frame covering region (default the whole screen), at most max_age seconds old"""
+        max_age = self.freshness if max_age is None else max_age
+        now = time.perf_counter()
+        frame = self._frame
+        if frame is not None and now - frame.captured_at <= max_age:
+            if region is None:
+                if self.screen_size is not None and frame.region == (0, 0) + self.screen_size:
+                    self.reuses += 1
+                    return frame
+            elif frame.covers(region):
+                self.reuses += 1
+                return frame
+
+        pixels = np.asarray(self.grab(region))
+        self.grabs += 1
+        if region is None:
+            self.screen_size = (pixels.shape[1], pixels.shape[0])
+            region = (0, 0) + self.screen_size
+        frame = self._frame = Frame(pixels, region, now)
+        return frame
+
+    def capture(self, region: Optional[Region] = None, max_age: Optional[float] = None) -> np.ndarray:
+        """Pixels of region (default the whole screen); may be a view into a shared frame"""
+        frame = self.frame(region, max_age)
+        return frame.pixels if region is None else frame.crop(region)
+
+    def pixel(self, x: int, y: int, max_age: Optional[float] = None) -> Tuple[int, ...]:
+        """Color at a screen position, as an (r, g, b) tuple"""
+        inside = x >= 0 and y >= 0
+        if inside and self.screen_size is not None:
+            inside = x < self.screen_size[0] and y < self.screen_size[1]
+        # Off-screen grabs come back empty or clipped rather than failing
+        pixels = self.capture((x, y, 1, 1), max_age) if inside else None
+        if pixels is None or pixels.shape[:2] != (1, 1):
+            size = f" {self.screen_size[0]}x{self.screen_size[1]}" if self.screen_size else ""
+            raise ValueError(f"Pixel ({x}, {y}) is outside the{size} screen")
+        return tuple(int(channel) for channel in np.atleast_1d(pixels[0, 0])[:3])
+
+    def hashes(self, region: Optional[Region] = None, tile: int = TILE_SIZE,
+               max_age: Optional[float] = None) -> np.ndarray:
+        """Tile hashes of region, for comparing against a later call with dirty_tiles"""
+        return tile_hashes(self.capture(region, max_age), tile)
@@ -0,0 +1,258 @@
+"""
+Step plan compiler for KeyKraken
+Turns scenario step dicts into a validated, pre-resolved execution plan
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+STEP_TYPES = ('click', 'keypress', 'type', 'scroll', 'move', 'path', 'image',
+              'wait_pixel', 'wait_image', 'wait_region_stable', 'delay')
+# Steps that poll the screen until a condition holds instead of sleeping a fixed time
+WAIT_STEP_TYPES = ('wait_pixel', 'wait_image', 'wait_region_stable')
+MOUSE_BUTTONS = ('left', 'right', 'middle')
+DEFAULT_DELAY = 0.25
+DEFAULT_TYPE_INTERVAL = 0.05
+# Image steps: minimum match score, and how long to keep looking before failing
+DEFAULT_CONFIDENCE = 0.9
+DEFAULT_IMAGE_TIMEOUT = 3.0
+# Wait steps: seconds before the run fails, and seconds between screen checks
+DEFAULT_WAIT_TIMEOUT = 10.0
+DEFAULT_POLL_INTERVAL = 0.05
+# Largest per-channel difference at which a wait_pixel color still matches
+DEFAULT_COLOR_TOLERANCE = 10
+# Seconds a wait_region_stable region must stay unchanged
+DEFAULT_STABLE_SECONDS = 0.5
+# Conditions a step's optional 'verify' object can check after the step; each
+# takes the same fields as the matching wait_* step, minus the timeout
+VERIFY_TYPES = ('pixel', 'image', 'region_stable')
+
+# (left, top, width, height) in screen pixels, as pyautogui uses
+Region = Tuple[int, int, int, int]
+
+
+class StepValidationError(ValueError):
+    """Raised when a scenario step cannot be compiled"""
+
+    def __init__(self, index: int, step: Any, reason: str):
+        name = step.get('name', '') if isinstance(step, dict) else ''
+        label = f"Step {index + 1}" + (f" ({name})" if name else "")
+        super().__init__(f"{label}: {reason}")
+        self.index = index
+        self.reason = reason
+
+
+def _no_op(*args):
+    pass
+
+
+class PlanOp:
+    """
+    A single compiled step: handler, positional args and post-step delay.
+    duration is how long the step's own action is scripted to take (e.g. typing
+    its text), before the delay starts.
+    verify is None, or (condition type, condition args, poll seconds) for a
+    step whose effect can be checked on screen.
+    """
+    __slots__ = ('index', 'name', 'kind', 'handler', 'args', 'delay', 'duration', 'verify')
+
+    def __init__(self, index: int, name: str, kind: str,
+                 handler: Callable[..., Any], args: Tuple, delay: float,
+                 verify: Optional[Tuple[str, Tuple, float]] = None, duration: float = 0.0):
+        self.index = index
+        self.name = name
+        self.kind = kind
+        self.handler = handler
+        self.args = args
+        self.delay = delay
+        self.duration = duration
+        self.verify = verify
+
+    def __repr__(self):
+        return f"PlanOp({self.index}, {self.kind!r}, {self.args!r}, delay={self.delay})"
+
+
+def _parse_point(value: Any) -> Tuple[int, int]:
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"expected [x, y] coordinates, got {value!r}")
+    x, y = value
+    if isinstance(x, bool) or isinstance(y, bool):
+        raise ValueError(f"expected [x, y] coordinates, got {value!r}")
+    return int(x), int(y)
+
+
+def _parse_seconds(value: Any, what: str) -> float:
+    if isinstance(value, bool):
+        raise ValueError(f"{what} must be a number, got {value!r}")
+    seconds = float(value)
+    if seconds < 0 or seconds != seconds:
+        raise ValueError(f"{what} must be a non-negative number, got {value!r}")
+    return seconds
+
+
+def _parse_color(value: Any) -> Tuple[int, int, int]:
+    """An (r, g, b) tuple from '#rrggbb' or [r, g, b]"""
+    if isinstance(value, str):
+        text = value[1:] if value.startswith('#') else value
+        if len(text) == 6:
+            try:
+                return int(text[0:2], 16), int(text[2:4], 16), int(text[4:6], 16)
+            except ValueError:
+                pass
+    elif isinstance(value, (list, tuple)) and len(value) == 3 and not any(isinstance(c, bool) for c in value):
+        color = tuple(int(c) for c in value)
+        if all(0 <= c <= 255 for c in color):
+            return color
+    raise ValueError(f"expected a color as '#rrggbb' or [r, g, b], got {value!r}")
+
+
+def _parse_region(value: Any) -> Region:
+    if not isinstance(value, (list, tuple)) or len(value) != 4 or any(isinstance(v, bool) for v in value):
+        raise ValueError(f"expected [left, top, width, height] region, got {value!r}")
+    left, top, width, height = (int(v) for v in value)
+    if width <= 0 or height <= 0:
+        raise ValueError(f"region width and height must be positive, got {value!r}")
+    return left, top, width, height
+
+
+def _parse_wait(step: Dict[str, Any]) -> Tuple[float, float]:
+    timeout = _parse_seconds(step.get('timeout', DEFAULT_WAIT_TIMEOUT), "timeout")
+    poll = _parse_seconds(step.get('poll', DEFAULT_POLL_INTERVAL), "poll")
+    if poll == 0:
+        raise ValueError("poll must be greater than 0")
+    return timeout, poll
+
+
+def _parse_confidence(step: Dict[str, Any]) -> float:
+    confidence = float(step.get('confidence', DEFAULT_CONFIDENCE))
+    if not 0 < confidence <= 1:
+        raise ValueError(f"confidence must be between 0 and 1, got {confidence!r}")
+    return confidence
+
+
+def _parse_args(step_type: str, step: Dict[str, Any]) -> Tuple:
+    value = step.get('value', '')
+
+    if step_type in ('click', 'move'):
+        x, y = _parse_point(value)
+        if step_type == 'move':
+            return (x, y)
+        button = step.get('button', 'left')
+        if button not in MOUSE_BUTTONS:
+            raise ValueError(f"unknown mouse button {button!r}")
+        return (x, y, button)
+
+    if step_type in ('keypress', 'type'):
+        if not isinstance(value, str):
+            raise ValueError(f"expected text value, got {value!r}")
+        if step_type == 'keypress':
+            if not value:
+                raise ValueError("keypress needs a key name")
+            return (value,)
+        return (value, _parse_seconds(step.get('interval', DEFAULT_TYPE_INTERVAL), "interval"))
+
+    if step_type == 'path':
+        if not isinstance(value, list) or not value:
+            raise ValueError("path needs a list of [x, y, seconds] points")
+        points = []
+        previous = 0.0
+        for point in value:
+            if not isinstance(point, (list, tuple)) or len(point) != 3:
+                raise ValueError(f"expected [x, y, seconds] path point, got {point!r}")
+            x, y = _parse_point(point[:2])
+            offset = _parse_seconds(point[2], "path point time")
+            if offset < previous:
+                raise ValueError("path point times must not decrease")
+            points.append((x, y, offset))
+            previous = offset
+        return (tuple(points),)
+
+    if step_type in ('image', 'wait_image'):
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"{step_type} needs the path of a template image")
+        confidence = _parse_confidence(step)
+        if step_type == 'wait_image':
+            return (value, confidence) + _parse_wait(step)
+        button = step.get('button', 'left')
+        if button not in MOUSE_BUTTONS:
+            raise ValueError(f"unknown mouse button {button!r}")
+        return (value, confidence, button, _parse_seconds(step.get('timeout', DEFAULT_IMAGE_TIMEOUT), "timeout"))
+
+    if step_type == 'wait_pixel':
+        x, y = _parse_point(value)
+        tolerance = step.get('tolerance', DEFAULT_COLOR_TOLERANCE)
+        if isinstance(tolerance, bool) or not 0 <= int(tolerance) <= 255:
+            raise ValueError(f"tolerance must be between 0 and 255, got {tolerance!r}")
+        return (x, y, _parse_color(step.get('color')), int(tolerance)) + _parse_wait(step)
+
+    if step_type == 'wait_region_stable':
+        stable = _parse_seconds(step.get('stable', DEFAULT_STABLE_SECONDS), "stable")
+        return (_parse_region(value), stable) + _parse_wait(step)
+
+    if step_type == 'scroll':
+        if isinstance(value, bool):
+            raise ValueError(f"expected scroll amount, got {value!r}")
+        return (int(value),)
+
+    raise ValueError(f"unknown step type {step_type!r}")
+
+
+def _duration(step_type: str, args: Tuple) -> float:
+    """Seconds the step's action itself is scripted to take"""
+    if step_type == 'type':
+        text, interval = args
+        return max(len(text) - 1, 0) * interval
+    if step_type == 'path':
+        # Points carry their offset from the start of the path
+        return args[0][-1][2]
+    return 0.0
+
+
+def _parse_verify(verify: Any) -> Optional[Tuple[str, Tuple, float]]:
+    if verify is None:
+        return None
+    if not isinstance(verify, dict) or verify.get('type') not in VERIFY_TYPES:
+        raise ValueError(f"verify must be an object with a type of {', '.join(VERIFY_TYPES)}")
+    # Parsed like the wait step; the condition args end before its timeout and poll
+    args = _parse_args('wait_' + verify['type'], verify)
+    return verify['type'], args[:-2], args[-1]
+
+
+def compile_step(index: int, step: Any, handlers: Dict[str, Callable[..., Any]]) -> PlanOp:
+    """
+    Validate one step and resolve its handler.
+    :raises StepValidationError: If the step is malformed.
+    """
+    if not isinstance(step, dict):
+        raise StepValidationError(index, step, "step must be an object")
+
+    step_type = step.get('type', '')
+    handler = _no_op if step_type == 'delay' else handlers.get(step_type)
+    if handler is None:
+        raise StepValidationError(index, step, f"unknown step type {step_type!r}")
+
+    try:
+        delay = _parse_seconds(step.get('delay', DEFAULT_DELAY), "delay")
+        if step_type == 'delay':
+            args = ()
+            delay += _parse_seconds(step.get('value', ''), "delay value")
+        else:
+            args = _parse_args(step_type, step)
+        verify = _parse_verify(step.get('verify'))
+    except (TypeError, ValueError) as e:
+        raise StepValidationError(index, step, str(e)) from None
+
+    name = str(step.get('name', '')) or f"{step_type} step"
+    return PlanOp(index, name, step_type, handler, args, delay, verify, _duration(step_type, args))
+
+
+def compile_steps(steps: Sequence[Dict[str, Any]],
+                  handlers: Dict[str, Callable[..., Any]]) -> List[PlanOp]:
+    """
+    Validate every step and resolve its handler once, up front.
+    :param steps: Scenario step dicts as stored in the scenario file.
+    :param handlers: Mapping of step type to the callable that performs it.
+        Delay steps need no handler; their value is folded into the op's delay
+        so every wait goes through the executor's timing code.
+    :raises StepValidationError: On the first malformed step.
+    """
+    return [compile_step(index, step, handlers) for index, step in enumerate(steps)]
@@ -0,0 +1,294 @@
+"""
+Scenario validator for KeyKraken
+Checks every scenario in a directory before it is run: step schema, key names
+(against pyautogui.KEYBOARD_KEYS), coordinates against the screen bounds, that
+image step templates exist, and an estimate of the running time. Files are
+checked in a process pool and the results cached by content hash, so
+re-validating only touches changed files.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+from utils.scenario_store import load_scenario_file, SCENARIO_EXTENSIONS
+from utils.step_plan import compile_step, StepValidationError, STEP_TYPES
+
+CACHE_FILENAME = ".keykraken_validation.json"
+# Bump when checks change so cached results from older rules are ignored
+VALIDATOR_VERSION = 5
+# Per-scenario cap on reported problems; the count is still exact
+MAX_ISSUES = 50
+
+# Every step type validates without performing anything
+_HANDLERS = {step_type: (lambda *args: None) for step_type in STEP_TYPES}
+
+
+class ValidationSettings:
+    """
+    What to check scenarios against.
+    :param screen: (width, height) in pixels, or None to skip bounds checks.
+    :param key_names: Valid key names, or None to skip key checks.
+    """
+
+    def __init__(self, screen: Optional[Tuple[int, int]] = None,
+                 key_names: Optional[FrozenSet[str]] = None):
+        self.screen = screen
+        self.key_names = key_names
+
+    @classmethod
+    def detect(cls) -> 'ValidationSettings':
+        """Screen size and key names from pyautogui, where it can be imported"""
+        try:
+            import pyautogui
+        except Exception:
+            return cls()
+        try:
+            width, height = pyautogui.size()
+            screen = (int(width), int(height))
+        except Exception:
+            screen = None
+        return cls(screen, frozenset(pyautogui.KEYBOARD_KEYS))
+
+    def fingerprint(self) -> str:
+        """Changes whenever a cached result could no longer be trusted"""
+        keys = sorted(self.key_names) if self.key_names is not None else None
+        payload = json.dumps([VALIDATOR_VERSION, self.screen, keys])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _key_known(key: str, key_names: FrozenSet[str]) -> bool:
+    # KEYBOARD_KEYS lists letters in lower case only: pyautogui lower-cases
+    # multi-character names and types capitals by holding shift
+    return key in key_names or key.lower() in key_names
+
+
+def _points(op) -> List[Tuple[int, int]]:
+    points = []
+    if op.kind in ('click', 'move', 'wait_pixel'):
+        points.append(op.args[:2])
+    elif op.kind == 'path':
+        points.extend(point[:2] for point in op.args[0])
+    elif op.kind == 'wait_region_stable':
+        left, top, width, height = op.args[0]
+        points.extend([(left, top), (left + width - 1, top + height - 1)])
+    if op.verify is not None:
+        kind, args, _ = op.verify
+        if kind == 'pixel':
+            points.append(args[:2])
+        elif kind == 'region_stable':
+            left, top, width, height = args[0]
+            points.extend([(left, top), (left + width - 1, top + height - 1)])
+    return points
+
+
+def _image(op) -> Optional[str]:
+    """Template path the step or its verify condition looks for, if any"""
+    if op.kind in ('image', 'wait_image'):
+        return op.args[0]
+    if op.verify is not None and op.verify[0] == 'image':
+        return op.verify[1][0]
+    return None
+
+
+def _image_exists(value: str, base_dir: Path) -> bool:
+    # Resolved the way MacroEngine does: scenario folder first, then working directory
+    path = Path(value)
+    return (not path.is_absolute() and (base_dir / path).is_file()) or path.is_file()
+
+
+def validate_scenario(path: Union[str, Path], settings: ValidationSettings) -> Dict[str, Any]:
+    """
+    Check one scenario file.
+    :return: Report dict: file, name, ok, steps, loops, estimated_seconds (one
+        iteration), images (template paths used by image steps), errors and
+        warnings (lists of {"step", "message"}; step is 1-based or None for the
+        whole file).
+    """
+    path = Path(path)
+    report: Dict[str, Any] = {"file": path.name, "name": path.stem, "ok": False, "steps": 0,
+                              "loops": 1, "estimated_seconds": 0.0, "images": [], "errors": [], "warnings": []}
+    errors, warnings = report["errors"], report["warnings"]
+    error_count = 0
+
+    def problem(issues: List[Dict[str, Any]], step: Optional[int], message: str):
+        nonlocal error_count
+        if issues is errors:
+            error_count += 1
+        if len(issues) < MAX_ISSUES:
+            issues.append({"step": step, "message": message})
+
+    try:
+        data = load_scenario_file(path)
+    except Exception as e:
+        problem(errors, None, f"cannot load: {e}")
+        report["error_count"] = error_count
+        return report
+
+    if not isinstance(data, dict) or not isinstance(data.get('steps', []), Sequence):
+        problem(errors, None, "not a scenario: expected an object with a 'steps' list")
+        report["error_count"] = error_count
+        return report
+
+    report["name"] = str(data.get('name', '')) or path.stem
+    try:
+        report["loops"] = int(data.get('loops', 1))
+    except (TypeError, ValueError):
+        problem(errors, None, f"loops must be an integer, got {data.get('loops')!r}")
+
+    steps = data.get('steps', [])
+    report["steps"] = len(steps)
+    if not steps:
+        problem(warnings, None, "scenario has no steps")
+
+    width, height = settings.screen or (0, 0)
+    estimated = 0.0
+    for index, step in enumerate(steps):
+        try:
+            op = compile_step(index, step, _HANDLERS)
+        except StepValidationError as e:
+            problem(errors, index + 1, e.reason)
+            continue
+        # Condition waits count as 0: they take as long as the application does
+        estimated += op.duration + op.delay
+
+        image = _image(op)
+        if image is not None:
+            if image not in report["images"]:
+                report["images"].append(image)
+            if not _image_exists(image, path.parent):
+                problem(errors, index + 1, f"image file not found: {image}")
+        if settings.screen is not None:
+            for x, y in _points(op):
+                if not (0 <= x < width and 0 <= y < height):
+                    problem(errors, index + 1, f"({x}, {y}) is outside the {width}x{height} screen")
+                    break
+        if settings.key_names is not None:
+            if op.kind == 'keypress' and not _key_known(op.args[0], settings.key_names):
+                problem(errors, index + 1, f"unknown key name {op.args[0]!r}")
+            elif op.kind == 'type':
+                unknown = sorted({char for char in op.args[0] if not _key_known(char, settings.key_names)})
+                if unknown:
+                    problem(warnings, index + 1, f"characters that can't be typed: {''.join(unknown)!r}")
+
+    report["estimated_seconds"] = round(estimated, 3)
+    report["error_count"] = error_count
+    report["ok"] = error_count == 0
+    return report
+
+
+def _validate_job(job: Tuple[str, ValidationSettings]) -> Dict[str, Any]:
+    return validate_scenario(*job)
+
+
+def _load_cache(path: Path, fingerprint: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('fingerprint') != fingerprint:
+        return {}
+    return cache.get('results', {})
+
+
+def _save_cache(path: Path, fingerprint: str, results: Dict[str, Dict[str, Any]]):
+    temp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump({"fingerprint": fingerprint, "results": results}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        # The cache only saves time; a read-only scenarios folder still validates
+        pass
+
+
+def validate_directory(directory: Union[str, Path], settings: Optional[ValidationSettings] = None,
+                       files: Optional[Sequence[Union[str, Path]]] = None,
+                       jobs: Optional[int] = None, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Validate scenarios in parallel.
+    :param files: Scenario files to check; default every scenario in directory.
+    :param jobs: Worker processes (default: one per CPU).
+    :param use_cache: Reuse results for files whose content hash hasn't changed.
+    :return: Machine-readable report with a summary and one entry per scenario.
+    """
+    directory = Path(directory)
+    settings = settings or ValidationSettings.detect()
+    if files is None:
+        paths = sorted(path for path in directory.iterdir()
+                       if path.suffix in SCENARIO_EXTENSIONS and not path.name.startswith('.'))
+    else:
+        paths = [Path(path) for path in files]
+
+    fingerprint = settings.fingerprint()
+    cache_path = directory / CACHE_FILENAME
+    cache = _load_cache(cache_path, fingerprint) if use_cache else {}
+
+    hashes: Dict[Path, Optional[str]] = {}
+    results: Dict[Path, Dict[str, Any]] = {}
+    pending = []
+    for path in paths:
+        try:
+            hashes[path] = content_hash(path)
+        except OSError:
+            hashes[path] = None
+        cached = cache.get(hashes[path]) if hashes[path] else None
+        if cached is not None:
+            results[path] = dict(cached, file=path.name, cached=True)
+        else:
+            pending.append(path)
+
+    if len(pending) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            fresh = list(pool.map(_validate_job, [(str(path), settings) for path in pending],
+                                  chunksize=max(1, len(pending) // (4 * (jobs or os.cpu_count() or 1)))))
+    else:
+        fresh = [validate_scenario(path, settings) for path in pending]
+
+    for path, report in zip(pending, fresh):
+        results[path] = dict(report, cached=False)
+        # Image checks depend on files besides the scenario, so those reports aren't cached
+        if hashes[path] and not report["images"]:
+            cache[hashes[path]] = report
+
+    if use_cache:
+        if files is None:
+            # A full scan saw every scenario, so drop entries for files that no longer exist
+            live = {hashes[path] for path in paths if hashes[path]}
+            cache = {key: value for key, value in cache.items() if key in live}
+        _save_cache(cache_path, fingerprint, cache)
+
+    scenarios = []
+    for path in paths:
+        report = results[path]
+        report["hash"] = hashes[path]
+        scenarios.append(report)
+    return {
+        "version": VALIDATOR_VERSION,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "directory": str(directory),
+        "screen": list(settings.screen) if settings.screen else None,
+        "key_names_checked": settings.key_names is not None,
+        "summary": {
+            "scenarios": len(scenarios),
+            "ok": sum(1 for report in scenarios if report["ok"]),
+            "failed": sum(1 for report in scenarios if not report["ok"]),
+            "cached": sum(1 for report in scenarios if report["cached"]),
+            "estimated_seconds": round(sum(report["estimated_seconds"] * max(report["loops"], 1)
+                                           for report in scenarios), 3),
+        },
+        "scenarios": scenarios,
+    }